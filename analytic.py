@@ -0,0 +1,101 @@
+import math
+from typing import Callable
+from environment import Environment
+
+# The vessel equations used by SimulationKernel._advance_vessels
+#   dT/dt = -cooling_rate * (T - ambient_temp) + heating
+#   dV/dt = -evap_rate * (T - ambient_temp)
+#   dp/dt = -particle_release_rate * p   (p moves into tea_particle_amount)
+# where heating is the heating_rate of a container whose heater is on (zero
+# otherwise), and their closed-form solutions. All functions work on floats as well as on
+# numpy arrays.
+
+def vessel_derivative(env: Environment, particle_release_rate: any,
+                      heating: any=None) -> Callable[[tuple], tuple]:
+    """Right-hand side of the vessel equations for the state
+    (temp_curr, vol_curr, tea_particle_amount, current_particle_amount).
+    `heating` is None if no heater is on, so that unheated vessels do not
+    pay for it."""
+    def derivative(state: tuple) -> tuple:
+        temp, _, _, particles = state
+        delta_temp = temp - env.ambient_temp
+        dp = particle_release_rate * particles
+        dT = -env.cooling_rate * delta_temp
+        if heating is not None:
+            dT = dT + heating
+        return (dT, -env.evap_rate * delta_temp, dp, -dp)
+    return derivative
+
+def euler_step_factor(z: any) -> any:
+    return 1 - z
+
+def exact_step_factor(z: any) -> any:
+    # math.e ** x also broadcasts over numpy arrays
+    return math.e ** -z
+
+def decay_factor(rate: any, time_tick: float, n_ticks: int, exact: bool=False,
+                 step_factor: Callable[[any], any]=euler_step_factor) -> any:
+    """Factor by which a quantity decaying at `rate` shrinks over `n_ticks`.
+    By default this is the factor of the stepped recurrence of the integrator
+    whose `step_factor` is given (forward Euler unless stated otherwise),
+    which is what `advance()` computes tick by tick. With `exact` it is the
+    exponential solution of the ODE."""
+    if exact:
+        return exact_step_factor(rate * time_tick * n_ticks)
+    return step_factor(rate * time_tick) ** n_ticks
+
+def is_monotonic(step_factor: any) -> bool:
+    """The stepped recurrence only decays monotonically (and can therefore be
+    validated at its end points) if its factor per step lies in [0, 1]."""
+    if hasattr(step_factor, "all"):
+        return bool(((step_factor >= 0) & (step_factor <= 1)).all())
+    return 0 <= step_factor <= 1
+
+def is_uncooled(cooling_rate: any) -> bool:
+    # whether any (per-scenario) cooling rate is zero
+    is_static = cooling_rate == 0
+    if hasattr(is_static, "any"):
+        return bool(is_static.any())
+    return is_static
+
+def jump_temperature(temp: any, ambient_temp: float, factor: any,
+                     heating: any=0.0, cooling_rate: float=0.0,
+                     duration: float=0.0) -> any:
+    # a heater moves the temperature the vessel settles at up by
+    # heating / cooling_rate, the decay towards it is the same. Without
+    # cooling (factor one) the heater raises the temperature linearly.
+    is_static = cooling_rate == 0
+    offset = heating / (cooling_rate + is_static)
+    return ambient_temp + offset + (temp - ambient_temp - offset) * factor \
+        + is_static * heating * duration
+
+def jump_volume(vol: any, temp: any, new_temp: any, cooling_rate: float,
+                evap_rate: float, duration: float, ambient_temp: float,
+                heating: any=0.0) -> any:
+    # the volume lost follows the temperature lost, since
+    # dV/dT = evap_rate / cooling_rate for both the ODE and any Runge-Kutta
+    # discretization of it (linear invariants are preserved)
+    # without cooling the temperature is constant and the volume drops
+    # linearly instead. The two cases are blended rather than branched on so
+    # that per-scenario cooling rates (arrays) are handled too.
+    # a heater adds a constant drift of -evap_rate * heating / cooling_rate
+    # to V - evap_rate / cooling_rate * T (and a quadratic term without
+    # cooling, which only the exact solution follows)
+    is_static = cooling_rate == 0
+    linear = vol - evap_rate * duration * (temp - ambient_temp) \
+        - evap_rate * heating * duration ** 2 / 2
+    ratio = evap_rate / (cooling_rate + is_static)
+    coupled = vol + ratio * (new_temp - temp) - ratio * heating * duration
+    return is_static * linear + (1 - is_static) * coupled
+
+def crossing_ticks(value: float, target: float, equilibrium: float,
+                   factor: float) -> float | None:
+    """Fractional number of ticks after which a quantity relaxing as
+    `equilibrium + (value - equilibrium) * factor ** n` reaches `target`,
+    or None if it never does."""
+    if not 0 < factor < 1 or value == equilibrium:
+        return None
+    ratio = (target - equilibrium) / (value - equilibrium)
+    if not 0 < ratio <= 1:
+        return None
+    return math.log(ratio) / math.log(factor)
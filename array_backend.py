@@ -0,0 +1,244 @@
+from container import Container
+from cup import Cup
+from entity import Entity
+from environment import Environment
+import custom_exceptions as cex
+from integrators import Integrator
+from schema import compile_array_validator
+from interpreter import DeltaObject
+from buffer_liquid import mix
+from typing import Callable
+import analytic
+
+# columns changed by the simulation, the others are shared between forks
+VARIABLE_COLUMNS: tuple[str, ...] = ("temp_curr", "vol_curr",
+                                     "tea_particle_amount",
+                                     "current_particle_amount", "tea_volume",
+                                     "is_heater_on")
+
+# the columns holding the fields of the nested entities in Container.SCHEMA
+SCHEMA_COLUMNS: dict[str, str] = {
+    "tea_content.current_particle_amount": "current_particle_amount",
+    "tea_content.volume": "tea_volume",
+    "vessel_type.vol_max": "vol_max",
+}
+
+# numpy is only needed by the array backend, the object backend runs without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class VesselArrays:
+    """Structure-of-arrays view of every `Container` and `Cup` in the
+    simulation. Each variable is stored in one contiguous column where row `i`
+    belongs to the entity `ids[i]`, so that a tick is a handful of vector
+    operations instead of one Python loop iteration per entity."""
+
+    def __init__(self, entity_list: list[Entity],
+                 n_scenarios: int | None=None) -> None:
+        if np is None:
+            raise cex.BackendNotAvailableError(
+                "The array backend requires numpy to be installed."
+            )
+        for entity in entity_list:
+            if not isinstance(entity, (Container, Cup)):
+                raise cex.EntityTypeNotSupportedError(
+                    f"Entity {entity.id} is not supported by the array backend."
+                )
+        self.entities: list[Entity] = list(entity_list)
+        self.ids: list[str] = [entity.id for entity in self.entities]
+        self.rows: dict[str, int] = {id: row for row, id in enumerate(self.ids)}
+        # with a number of scenarios every column becomes a
+        # [scenario x entity] array, see BatchedSimulationKernel
+        self.n_scenarios: int | None = n_scenarios
+        # static columns
+        self.vol_max = self._column("vol_max")
+        self.particle_release_rate = self._tea_column("particle_release_rate")
+        # cups have no heater
+        self.heating_rate = self._column("heating_rate", 0.0)
+        # variable columns, the tea volume and the heaters only change
+        # through commands
+        self.tea_volume = self._tea_column("volume")
+        self.is_heater_on = self._column("is_heater_on", 0.0)
+        self._update_heating()
+        self.temp_curr = self._column("temp_curr")
+        self.vol_curr = self._column("vol_curr")
+        self.tea_particle_amount = self._column("tea_particle_amount")
+        self.current_particle_amount = self._tea_column("current_particle_amount")
+        # the entity objects are only written back when they are observed,
+        # this holds the scenario they currently show (None if stale)
+        self._synced_scenario: int | None = 0
+        # forks share the columns until either side writes to them
+        self._is_shared: bool = False
+
+    def _column(self, name: str, default: float | None=None) -> "np.ndarray":
+        return self._broadcast(np.fromiter(
+            (getattr(entity, name, default) for entity in self.entities),
+            dtype=np.float64, count=len(self.entities)))
+
+    def _tea_column(self, name: str) -> "np.ndarray":
+        return self._broadcast(np.fromiter(
+            (getattr(entity.tea_content, name) for entity in self.entities),
+            dtype=np.float64, count=len(self.entities)))
+
+    def _broadcast(self, column: "np.ndarray") -> "np.ndarray":
+        if self.n_scenarios is None:
+            return column
+        # every scenario starts from the same initial conditions
+        return np.tile(column, (self.n_scenarios, 1))
+
+    def _update_heating(self) -> None:
+        # heating of every vessel (zero unless its heater is on), or None
+        # while every heater is off so that the tick skips it
+        self.heating: "np.ndarray | None" = None
+        if self.is_heater_on.any():
+            self.heating = self.heating_rate * self.is_heater_on
+
+    def fork(self, entity_list: list[Entity]) -> "VesselArrays":
+        """Copy-on-write copy for `SimulationKernel.fork()` over the cloned
+        entities: nothing is copied until one of the two advances."""
+        fork = object.__new__(type(self))
+        fork.__dict__.update(self.__dict__)
+        fork.entities = entity_list
+        self._is_shared = fork._is_shared = True
+        return fork
+
+    def _own(self) -> None:
+        # copy the shared variable columns before the first write
+        if self._is_shared:
+            for name in VARIABLE_COLUMNS:
+                setattr(self, name, getattr(self, name).copy())
+            self._is_shared = False
+
+    def advance(self, env: Environment, integrator: Integrator) -> None:
+        # same differentials as SimulationKernel._advance_vessels, but for
+        # every vessel at once
+        self._own()
+        derivative = analytic.vessel_derivative(env, self.particle_release_rate,
+                                                self.heating)
+        dT, dV, dp, _ = integrator.increment(
+            derivative, (self.temp_curr, self.vol_curr,
+                         self.tea_particle_amount, self.current_particle_amount),
+            env.time_tick)
+        # update the variables in place
+        self.temp_curr += dT
+        self.vol_curr += dV
+        self.current_particle_amount -= dp
+        self.tea_particle_amount += dp
+        self._synced_scenario = None
+
+    def jump(self, env: Environment, n_ticks: int, exact: bool=False,
+             step_factor: Callable=analytic.euler_step_factor) -> None:
+        """Advances every vessel by `n_ticks` at once with the closed-form
+        solution from `analytic`."""
+        self._own()
+        temp_factor = analytic.decay_factor(env.cooling_rate, env.time_tick,
+                                            n_ticks, exact, step_factor)
+        particle_factor = analytic.decay_factor(self.particle_release_rate,
+                                                env.time_tick, n_ticks, exact,
+                                                step_factor)
+        heating = 0.0 if self.heating is None else self.heating
+        duration = env.time_tick * n_ticks
+        new_temp = analytic.jump_temperature(self.temp_curr, env.ambient_temp,
+                                             temp_factor, heating,
+                                             env.cooling_rate, duration)
+        self.vol_curr = analytic.jump_volume(
+            self.vol_curr, self.temp_curr, new_temp, env.cooling_rate,
+            env.evap_rate, duration, env.ambient_temp, heating)
+        self.temp_curr = new_temp
+        new_particles = self.current_particle_amount * particle_factor
+        self.tea_particle_amount += self.current_particle_amount - new_particles
+        self.current_particle_amount = new_particles
+        self._synced_scenario = None
+
+    def apply_actions(self, deltas: dict[str, DeltaObject]) -> None:
+        """Vectorized counterpart of `DeltaObject.apply` for the liquids and
+        tea leaves of every vessel touched in a tick."""
+        self._own()
+        rows = np.fromiter((self.rows[id] for id in deltas), dtype=np.intp,
+                           count=len(deltas))
+        def gather(values: any) -> "np.ndarray":
+            return np.fromiter(values, dtype=np.float64, count=len(deltas))
+        self.current_particle_amount[rows] += gather(
+            delta.leaf_particles for delta in deltas.values())
+        self.tea_volume[rows] += gather(
+            delta.leaf_volume for delta in deltas.values())
+        # every vessel touched this tick is mixed in one go
+        liquids = [delta.liquid for delta in deltas.values()]
+        self.vol_curr[rows], self.temp_curr[rows], \
+            self.tea_particle_amount[rows] = mix(
+                self.vol_curr[rows], self.temp_curr[rows],
+                self.tea_particle_amount[rows],
+                gather(delta.vol_out for delta in deltas.values()),
+                gather(liquid.volume for liquid in liquids),
+                gather(liquid.heat for liquid in liquids),
+                gather(liquid.particles for liquid in liquids),
+                self.vol_max[rows] - self.tea_volume[rows])
+        heaters = [(self.rows[id], delta.heater) for id, delta in deltas.items()
+                   if delta.heater is not None]
+        if heaters:
+            heater_rows, settings = zip(*heaters)
+            self.is_heater_on[list(heater_rows)] = settings
+            self._update_heating()
+        self._synced_scenario = None
+
+    def is_monotonic(self, env: Environment, step_factor: Callable) -> bool:
+        return analytic.is_monotonic(
+            step_factor(self.particle_release_rate * env.time_tick))
+
+    def is_heated(self) -> bool:
+        return self.heating is not None
+
+    # vectorized counterpart of Container._validate/Cup._validate, compiled
+    # from the same schema (the variables of cups have the same bounds), so
+    # the first failing bound raises the same exception type as the object
+    # backend would
+    validate = compile_array_validator(Container.SCHEMA, SCHEMA_COLUMNS)
+
+    def _raise_if(self, mask: "np.ndarray", error: type, message: str,
+                  column: "np.ndarray") -> None:
+        if mask.any():
+            # report the first offending row, like the object loop would
+            flat = int(np.argmax(mask))
+            scenario, row = divmod(flat, len(self.ids))
+            name = self.ids[row]
+            if self.n_scenarios is not None:
+                name += f" (scenario {scenario})"
+            raise error(message.format(column.flat[flat], name))
+
+    def sync(self, scenario: int=0, ids: list[str] | None=None) -> None:
+        """Writes the columns (of the given scenario when batched) back to the
+        entity objects so that `to_json` returns the current state. With
+        `ids`, only those entities are written."""
+        if self._synced_scenario == scenario:
+            return
+        temp_curr, vol_curr, tea_particle_amount, current_particle_amount = \
+            self.temp_curr, self.vol_curr, self.tea_particle_amount, \
+            self.current_particle_amount
+        if self.n_scenarios is not None:
+            temp_curr, vol_curr, tea_particle_amount, current_particle_amount = \
+                temp_curr[scenario], vol_curr[scenario], \
+                tea_particle_amount[scenario], current_particle_amount[scenario]
+        entities, tea_volume = self.entities, self.tea_volume
+        if ids is not None:
+            rows = [self.rows[id] for id in ids if id in self.rows]
+            entities = [entities[row] for row in rows]
+            temp_curr, vol_curr, tea_particle_amount, current_particle_amount, \
+                tea_volume = temp_curr[rows], vol_curr[rows], \
+                tea_particle_amount[rows], current_particle_amount[rows], \
+                tea_volume[..., rows]
+        # tolist() converts to python floats in one go
+        rows = zip(entities, temp_curr.tolist(), vol_curr.tolist(),
+                   tea_particle_amount.tolist(), current_particle_amount.tolist())
+        for entity, temp, vol, tea_particles, particles in rows:
+            entity.temp_curr = temp
+            entity.vol_curr = vol
+            entity.tea_particle_amount = tea_particles
+            entity.tea_content.current_particle_amount = particles
+        if self.n_scenarios is None:
+            for entity, volume in zip(entities, tea_volume.tolist()):
+                entity.tea_content.volume = volume
+        # a partial write leaves the other entities stale
+        if ids is None:
+            self._synced_scenario = scenario
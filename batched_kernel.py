@@ -0,0 +1,129 @@
+from simulation_kernel import SimulationKernel
+from environment import Environment
+from integrators import Integrator
+import custom_exceptions as cex
+from array_backend import VesselArrays, np
+from typing import Iterable
+
+class BatchedSimulationKernel(SimulationKernel):
+    """Runs many scenarios that share the same entities (topology and initial
+    conditions) but differ in their `Environment` constants, all in one array
+    backend.
+
+    Every vessel variable is a [scenario x entity] array and every
+    `Environment` field a per-scenario column, so a tick advances all
+    scenarios with the same few vector operations as a single one. The
+    scenarios share one `time_tick` so that their ticks line up.
+    """
+
+    def __init__(self, integrator: str | Integrator="euler",
+                 validate_every: int | None=1) -> None:
+        super().__init__(backend="array", integrator=integrator,
+                         validate_every=validate_every)
+        self._n_scenarios: int = 0
+
+    def config_envs(self, env_list: list[Environment]) -> None:
+        if self._is_ready_to_run:
+            raise cex.SimulationAlreadyConfirmedError(
+                "Environments cannot be changed after the setup is confirmed."
+            )
+        if not env_list:
+            raise cex.InvalidArgumentError(
+                "At least one environment is needed."
+            )
+        if np is None:
+            raise cex.BackendNotAvailableError(
+                "The batched kernel requires numpy to be installed."
+            )
+        time_tick = env_list[0].time_tick
+        if any(env.time_tick != time_tick for env in env_list):
+            raise cex.InvalidArgumentError(
+                "Every scenario of a batch must use the same time tick."
+            )
+        def column(field: str) -> "np.ndarray":
+            # shaped [scenario x 1] to broadcast over the entities
+            return np.array([getattr(env, field) for env in env_list],
+                            dtype=np.float64)[:, None]
+        self._n_scenarios = len(env_list)
+        self.config_env(Environment(
+            cooling_rate=column("cooling_rate"),
+            ambient_temp=column("ambient_temp"),
+            time_tick=time_tick,
+            evap_rate=column("evap_rate")
+        ))
+
+    def confirm_setup(self) -> None:
+        if not self._n_scenarios:
+            raise cex.SimulationNotReadyError(
+                "BatchedSimulationKernel.config_envs() has to be called \
+                before confirming the setup."
+            )
+        super().confirm_setup()
+        if any(advance is not SimulationKernel._advance_vessels
+               for (advance, _, _), _ in self._groups):
+            raise cex.EntityTypeNotSupportedError(
+                "Only containers and cups can be simulated in a batch."
+            )
+
+    def cmd(self, action: str, args: dict | None=None, agent: str="",
+            is_strict: bool=False) -> None:
+        raise cex.InvalidArgumentError(
+            "Commands cannot be issued to a batched kernel, its scenarios \
+            would need one action buffer each."
+        )
+
+    def _make_arrays(self, vessels: list) -> VesselArrays:
+        return VesselArrays(vessels, self._n_scenarios)
+
+    def state(self, field: str) -> "np.ndarray":
+        """Returns the [scenario x entity] array of a vessel variable, e.g.
+        `state("temp_curr")[s, e]`. The entities are ordered like
+        `entity_ids()`."""
+        if field not in ("temp_curr", "vol_curr", "tea_particle_amount",
+                         "current_particle_amount"):
+            raise cex.InvalidArgumentError(
+                f"Variable {field} is not a batched vessel variable."
+            )
+        if self._arrays is None:
+            raise cex.SimulationNotReadyError(
+                "Method cannot be invoked due to simulation not fully set up \
+                properly."
+            )
+        return getattr(self._arrays, field)
+
+    def entity_ids(self) -> list[str]:
+        return [] if self._arrays is None else list(self._arrays.ids)
+
+    def view_obj(self, id: str, show_static: bool=False,
+                 scenario: int=0) -> dict:
+        self._sync(scenario=scenario)
+        return super().view_obj(id, show_static)
+
+    def view_status(self, verbose: bool=False, scenario: int=0,
+                    **filters: any) -> dict:
+        self._sync(scenario=scenario)
+        return super().view_status(verbose, **filters)
+
+    def export(self, fields: Iterable[str] | None=None, since: int | None=None,
+               encoding: str="columns", scenario: int=0) -> dict | bytes:
+        self._check_scenario(scenario)
+        return self._state_exporter().export(fields, since, encoding, scenario)
+
+    def changes(self, since: int | None=None, fields: Iterable[str] | None=None,
+                epsilon: float=0.0, scenario: int=0) -> dict:
+        self._check_scenario(scenario)
+        return self._state_exporter().changes(fields, since, epsilon, scenario)
+
+    def _check_scenario(self, scenario: int) -> None:
+        if not 0 <= scenario < self._n_scenarios:
+            raise cex.NonExistentObjectError(
+                f"Scenario {scenario} does not exist."
+            )
+
+    def _sync(self, ids: list[str] | None=None,
+              scenario: int | None=None) -> None:
+        # the base class syncs without a scenario, keep whichever one was
+        # requested last (always for every entity)
+        if self._arrays is not None and scenario is not None:
+            self._check_scenario(scenario)
+            self._arrays.sync(scenario)
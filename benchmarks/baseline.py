@@ -0,0 +1,68 @@
+"""Results of a benchmark as JSON, compared with those of an earlier run,
+for the benchmarks that take a `--baseline` (see `benchmarks.kernel`)."""
+import argparse
+import json
+import platform
+import sys
+from typing import Callable
+
+def add_arguments(parser: argparse.ArgumentParser, tolerance: float) -> None:
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline",
+                        help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=tolerance,
+                        help=f"growth flagged as a regression, e.g. "
+                             f"{tolerance}")
+
+def make_report(results: any, **settings: any) -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **settings,
+        "results": results,
+    }
+
+def compare(values: dict[str, float], before: dict[str, float],
+            tolerance: float, format: Callable[[str, float], str]) -> list[str]:
+    """Prints every value next to its baseline, as given by `format(name,
+    value)`, and returns the names of the regressions, i.e. the values more
+    than `tolerance` (e.g. 0.2 for 20%) larger."""
+    width = max(map(len, values), default=0)
+    regressions = []
+    for name, value in values.items():
+        if name not in before:
+            print(f"{name:>{width}}: not in the baseline")
+            continue
+        ratio = value / before[name]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + tolerance):
+            flag = "  improved"
+        print(f"{name:>{width}}: {format(name, before[name])} -> "
+              f"{format(name, value)} ({ratio:5.2f}x){flag}")
+    return regressions
+
+def finish(report: dict, args: argparse.Namespace,
+           values: Callable[[dict], dict[str, float]],
+           format: Callable[[str, float], str]) -> None:
+    """Writes `report` to `--output` and compares it with `--baseline`,
+    exiting with status 1 if anything regressed. `values` maps a report to
+    the named values to compare. Without either option the report is
+    printed."""
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline is None:
+        if args.output is None:
+            print(json.dumps(report, indent=2))
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(values(report), values(baseline), args.tolerance,
+                          format)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond "
+              f"{args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
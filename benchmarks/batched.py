@@ -0,0 +1,55 @@
+"""Compares one BatchedSimulationKernel against one SimulationKernel per
+scenario for the same sweep over `Environment` constants.
+
+Run from the repository root with `python -m benchmarks.batched`.
+"""
+import time
+from batched_kernel import BatchedSimulationKernel
+from simulation_kernel import SimulationKernel
+from cup import Cup
+from container import Container
+from teastate import TeaState
+from environment import Environment
+
+N_SCENARIOS: int = 500
+N_TICKS: int = 100
+
+def make_entities() -> list:
+    cups = [Cup(id=f"cup{i}", temp_init=90, vol_init=200,
+                tea_content=TeaState(id="", start_particle_count=5, volume=2,
+                                     particle_release_rate=0.2))
+            for i in range(20)]
+    return cups + [Container(id="container")]
+
+def make_envs() -> list[Environment]:
+    return [Environment(cooling_rate=0.001 * (i % 50 + 1),
+                        ambient_temp=15 + i % 10, evap_rate=0.001,
+                        time_tick=0.1) for i in range(N_SCENARIOS)]
+
+def main():
+    envs = make_envs()
+    start = time.perf_counter()
+    for env in envs:
+        sim = SimulationKernel()
+        sim.add_objs(make_entities())
+        sim.config_env(env)
+        sim.confirm_setup()
+        for _ in range(N_TICKS):
+            sim.advance()
+    looped = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim = BatchedSimulationKernel()
+    sim.add_objs(make_entities())
+    sim.config_envs(envs)
+    sim.confirm_setup()
+    for _ in range(N_TICKS):
+        sim.advance()
+    batched = time.perf_counter() - start
+
+    print(f"{N_SCENARIOS} scenarios x 21 entities x {N_TICKS} ticks")
+    print(f"one kernel per scenario: {looped:8.3f} s")
+    print(f"batched kernel:          {batched:8.3f} s ({looped / batched:.0f}x)")
+
+if __name__=="__main__":
+    main()
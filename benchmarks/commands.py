@@ -0,0 +1,49 @@
+"""Measures how many commands per second can be queued and committed, and
+what the committed pours cost per tick afterwards.
+
+Run from the repository root with `python -m benchmarks.commands`.
+"""
+import time
+from simulation_kernel import SimulationKernel
+from cup import Cup
+from container import Container
+from teastate import TeaState
+from environment import Environment
+
+N_COMMANDS: int = 100_000
+N_CONTAINERS: int = 100
+N_CUPS: int = 1000
+N_TICKS: int = 10
+
+def make_sim(backend: str) -> SimulationKernel:
+    sim = SimulationKernel(backend=backend)
+    sim.add_objs([Container(id=f"container{i}", vol_init=1000,
+                            tea_content=TeaState(id=""))
+                  for i in range(N_CONTAINERS)])
+    sim.add_objs([Cup(id=f"cup{i}", tea_content=TeaState(id=""))
+                  for i in range(N_CUPS)])
+    sim.config_env(Environment(cooling_rate=0.01, evap_rate=0.001))
+    sim.confirm_setup()
+    return sim
+
+def main():
+    print(f"{N_COMMANDS} pours from {N_CONTAINERS} containers into {N_CUPS} \
+cups, one agent each")
+    for backend in ("object", "array"):
+        sim = make_sim(backend)
+        start = time.perf_counter()
+        for i in range(N_COMMANDS):
+            sim.cmd("pour", {"from": f"container{i % N_CONTAINERS}",
+                             "to": f"cup{i % N_CUPS}", "volume": 0.01,
+                             "ticks": 5}, agent=f"agent{i}")
+        queued = time.perf_counter() - start
+        sim.commit()
+        committed = time.perf_counter() - start
+        sim.run(N_TICKS)
+        ran = time.perf_counter() - start - committed
+        print(f"{backend:>6}: {N_COMMANDS / committed:9.0f} commands/s \
+(queue {queued:.3f} s, commit {committed - queued:.3f} s), \
+{N_TICKS} ticks {ran:.3f} s")
+
+if __name__=="__main__":
+    main()
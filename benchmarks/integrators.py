@@ -0,0 +1,66 @@
+"""Compares the integrators at the same accuracy.
+
+For every integrator the largest time tick (from a fixed ladder) is picked
+whose final temperature after `HORIZON` seconds is within `TARGET_ERROR` of
+the exact solution, then steps taken and wall time at that tick are reported.
+
+Run from the repository root with `python -m benchmarks.integrators`.
+"""
+import math
+import time
+from simulation_kernel import SimulationKernel
+from container import Container
+from teastate import TeaState
+from environment import Environment
+from integrators import RK45Integrator
+import custom_exceptions as cex
+
+HORIZON: float = 600.0
+TARGET_ERROR: float = 1e-4
+TICKS: tuple[float, ...] = (60.0, 30.0, 10.0, 5.0, 1.0, 0.5, 0.1, 0.05,
+                            0.01, 0.005, 0.001)
+ENV = dict(cooling_rate=0.01, ambient_temp=20.0, evap_rate=0.001)
+
+def exact_temp() -> float:
+    return ENV["ambient_temp"] + (100.0 - ENV["ambient_temp"]) \
+        * math.exp(-ENV["cooling_rate"] * HORIZON)
+
+def simulate(integrator: str | RK45Integrator, time_tick: float) -> tuple:
+    sim = SimulationKernel(integrator=integrator)
+    sim.add_obj(Container(
+        id="container", temp_init=100, vol_init=1000,
+        tea_content=TeaState(id="", start_particle_count=50, volume=10,
+                             particle_release_rate=0.05)
+    ))
+    sim.config_env(Environment(time_tick=time_tick, **ENV))
+    sim.confirm_setup()
+    start = time.perf_counter()
+    for _ in range(round(HORIZON / time_tick)):
+        sim.advance()
+    elapsed = time.perf_counter() - start
+    error = abs(sim.view_obj("container")["temp_curr"] - exact_temp())
+    return error, sim._integrator.steps_taken, elapsed
+
+def main():
+    print(f"{'integrator':<12}{'tick':>8}{'steps':>10}{'error':>12}{'time (s)':>12}")
+    candidates = {
+        "euler": lambda: "euler",
+        "rk4": lambda: "rk4",
+        "rk45": lambda: RK45Integrator(rtol=TARGET_ERROR / 100,
+                                       atol=TARGET_ERROR / 100),
+    }
+    for name, make in candidates.items():
+        for time_tick in TICKS:
+            try:
+                error, steps, elapsed = simulate(make(), time_tick)
+            except cex.ValueOutOfRangeError:
+                # the scheme is unstable at this tick
+                continue
+            if error <= TARGET_ERROR:
+                print(f"{name:<12}{time_tick:>8}{steps:>10}{error:>12.2e}{elapsed:>12.4f}")
+                break
+        else:
+            print(f"{name:<12} did not reach {TARGET_ERROR} within the tick ladder")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compares the fused loop of the "jit" backend with the numpy passes of the
+"array" backend, tick by tick through advance() and many ticks per call
+through step(), on a mixed scene of containers and cups. Without numba the
+"jit" backend falls back to the array backend, which this reports.
+
+Run from the repository root with `python -m benchmarks.jit`.
+"""
+import time
+import warnings
+import numpy as np
+from simulation_kernel import SimulationKernel
+from environment import Environment
+import jit_backend
+from benchmarks.kernel import make_entities
+
+N_ENTITIES: tuple[int, ...] = (1_000, 100_000)
+N_TICKS: int = 200
+
+def make_sim(backend: str, n: int) -> SimulationKernel:
+    sim = SimulationKernel(backend=backend)
+    sim.add_objs(make_entities(n))
+    sim.config_env(Environment(cooling_rate=0.004, evap_rate=0.001,
+                               time_tick=0.01))
+    sim.confirm_setup()
+    return sim
+
+def timed(sim: SimulationKernel, stepped: bool) -> float:
+    start = time.perf_counter()
+    if stepped:
+        sim.step(N_TICKS)
+    else:
+        for _ in range(N_TICKS):
+            sim.advance()
+    return time.perf_counter() - start
+
+def main():
+    numba = jit_backend.import_numba()
+    if numba is None:
+        print("numba is not installed, jit is the array backend")
+        warnings.simplefilter("ignore")
+    else:
+        # the first call compiles
+        start = time.perf_counter()
+        make_sim("jit", 10).step(1)
+        print(f"numba {numba.__version__}, compiled in "
+              f"{time.perf_counter() - start:.2f} s")
+    for n in N_ENTITIES:
+        array = make_sim("array", n)
+        looped = timed(array, False)
+        jit = make_sim("jit", n)
+        advanced = timed(jit, False)
+        stepped_jit = make_sim("jit", n)
+        stepped = timed(stepped_jit, True)
+        array._sync()
+        stepped_jit._sync()
+        is_same = np.array_equal(array._arrays.temp_curr,
+                                 stepped_jit._arrays.temp_curr)
+        print(f"{n} entities x {N_TICKS} ticks "
+              f"({'same' if is_same else 'different'} results)")
+        print(f"  array advance(): {looped * 1e3:9.2f} ms")
+        print(f"  jit advance():   {advanced * 1e3:9.2f} ms "
+              f"({looped / advanced:.1f}x)")
+        print(f"  jit step():      {stepped * 1e3:9.2f} ms "
+              f"({looped / stepped:.1f}x)")
+
+if __name__=="__main__":
+    main()
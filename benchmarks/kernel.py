@@ -0,0 +1,158 @@
+"""Times the hot paths of SimulationKernel (add_objs, advance,
+view_status(verbose=True) and view_obj) at several scene sizes, with one
+container per `CUPS_PER_CONTAINER` cups, and writes the results as JSON.
+
+Given the JSON of an earlier run as a baseline, every case that got slower
+by more than the tolerance is flagged and the exit status is 1, so that a
+change can be checked against the tree it is based on:
+
+    python -m benchmarks.kernel --output base.json        # before
+    python -m benchmarks.kernel --baseline base.json      # after
+
+Each case reports the best of `--rounds` rounds, in seconds per call.
+
+Run from the repository root with `python -m benchmarks.kernel`.
+"""
+import argparse
+import gc
+import sys
+import time
+from typing import Callable
+from simulation_kernel import SimulationKernel, BACKENDS
+from container import Container
+from cup import Cup
+from entity import Entity
+from teastate import TeaState
+from environment import Environment
+from benchmarks import baseline
+
+SIZES: tuple[int, ...] = (10, 1_000, 10_000, 100_000)
+CASES: tuple[str, ...] = ("add_objs", "advance", "view_status", "view_obj")
+CUPS_PER_CONTAINER: int = 9
+# the number of ids view_obj cycles through
+N_VIEWED: int = 100
+# cheap calls are repeated until a round takes about this long
+ROUND_TIME: float = 0.05
+TOLERANCE: float = 0.2
+
+def make_entities(n: int) -> list[Entity]:
+    entities = []
+    for i in range(n):
+        if i % (CUPS_PER_CONTAINER + 1) == 0:
+            entities.append(Container(
+                id=f"container{i}", vol_init=1000,
+                tea_content=TeaState(id="", start_particle_count=50)))
+        else:
+            entities.append(Cup(
+                id=f"cup{i}", temp_init=90, vol_init=200,
+                tea_content=TeaState(id="", start_particle_count=5, volume=2,
+                                     particle_release_rate=0.2)))
+    return entities
+
+def make_sim(backend: str, n: int) -> SimulationKernel:
+    sim = SimulationKernel(backend=backend)
+    sim.add_objs(make_entities(n))
+    sim.config_env(Environment(cooling_rate=0.004, evap_rate=0.001,
+                               time_tick=0.01))
+    sim.confirm_setup()
+    return sim
+
+def best_time(call: Callable[[], None], rounds: int,
+              setup: Callable[[], None] | None=None) -> float:
+    """Best mean time per call over `rounds` rounds, each of as many calls
+    as it takes to spend `ROUND_TIME` in them. `setup` runs before every
+    call, untimed. The garbage collector is off while timing, as in
+    timeit."""
+    def timed_round(number: int) -> float:
+        gc.collect()
+        gc.disable()
+        try:
+            total = 0.0
+            for _ in range(number):
+                if setup is not None:
+                    setup()
+                start = time.perf_counter()
+                call()
+                total += time.perf_counter() - start
+            return total
+        finally:
+            gc.enable()
+    # warm up, e.g. for the jit backend to compile
+    timed_round(1)
+    number = 1
+    while (total := timed_round(number)) < ROUND_TIME:
+        number *= 2
+    # the round that was long enough counts as the first
+    totals = [total] + [timed_round(number) for _ in range(rounds - 1)]
+    return min(totals) / number
+
+def time_add_objs(backend: str, n: int, rounds: int) -> float:
+    # a fresh kernel and fresh entities for every call
+    state = {}
+    def setup() -> None:
+        state["sim"] = SimulationKernel(backend=backend)
+        state["entities"] = make_entities(n)
+    return best_time(lambda: state["sim"].add_objs(state["entities"]),
+                     rounds, setup)
+
+def time_advance(backend: str, n: int, rounds: int) -> float:
+    return best_time(make_sim(backend, n).advance, rounds)
+
+def time_view_status(backend: str, n: int, rounds: int) -> float:
+    # a tick before every call, so the array backend has to sync again
+    sim = make_sim(backend, n)
+    return best_time(lambda: sim.view_status(verbose=True), rounds,
+                     sim.advance)
+
+def time_view_obj(backend: str, n: int, rounds: int) -> float:
+    sim = make_sim(backend, n)
+    ids = sim.obj_catalog()[::max(1, n // N_VIEWED)]
+    def call() -> None:
+        for id in ids:
+            sim.view_obj(id, True)
+    return best_time(call, rounds, sim.advance) / len(ids)
+
+TIMERS: dict[str, Callable[[str, int, int], float]] = {
+    "add_objs": time_add_objs,
+    "advance": time_advance,
+    "view_status": time_view_status,
+    "view_obj": time_view_obj,
+}
+
+def run(sizes: tuple[int, ...], backends: tuple[str, ...],
+        cases: tuple[str, ...], rounds: int) -> dict:
+    results = []
+    for backend in backends:
+        for n in sizes:
+            for case in cases:
+                seconds = TIMERS[case](backend, n, rounds)
+                results.append({"case": case, "backend": backend,
+                                "n_entities": n, "seconds": seconds})
+                print(f"{backend:>6} {case:>12} {n:>7}: "
+                      f"{seconds * 1e3:10.4f} ms", file=sys.stderr)
+    return baseline.make_report(results, rounds=rounds)
+
+def seconds(report: dict) -> dict[str, float]:
+    # seconds per call by "case backend n_entities"
+    return {f"{result['case']} {result['backend']} {result['n_entities']}":
+            result["seconds"] for result in report["results"]}
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.kernel",
+        description="Benchmarks the hot paths of SimulationKernel.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS,
+                        default=BACKENDS)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--rounds", type=int, default=5)
+    baseline.add_arguments(parser, TOLERANCE)
+    args = parser.parse_args()
+
+    report = run(tuple(args.sizes), tuple(args.backends), tuple(args.cases),
+                 args.rounds)
+    baseline.finish(report, args, seconds,
+                    lambda name, value: f"{value * 1e3:10.4f} ms")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measures the memory held per entity and the per-tick advance time, and
+writes the results as JSON.
+
+Given the JSON of an earlier run as a baseline, every measure that grew by
+more than the tolerance is flagged and the exit status is 1, as with
+`benchmarks.kernel`:
+
+    python -m benchmarks.memory --output base.json        # before
+    python -m benchmarks.memory --baseline base.json      # after
+
+Run from the repository root with `python -m benchmarks.memory`.
+"""
+import argparse
+import sys
+import tracemalloc
+from typing import Callable
+from container import Container
+from cup import Cup
+from teastate import TeaState
+from environment import Environment
+from simulation_kernel import SimulationKernel
+from benchmarks import baseline
+from benchmarks.kernel import best_time
+
+N_ENTITIES: int = 100_000
+TOLERANCE: float = 0.2
+
+def bytes_per_entity(make, n: int=N_ENTITIES) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [make(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list itself is not part of the entities
+    return (after - before - entities.__sizeof__()) / n
+
+def make_cup(i: int) -> Cup:
+    return Cup(id=f"cup{i}", temp_init=90, vol_init=200,
+               tea_content=TeaState(id="", start_particle_count=5, volume=2))
+
+def make_container(i: int) -> Container:
+    return Container(id=f"container{i}",
+                     tea_content=TeaState(id="", start_particle_count=50))
+
+def advance_time(n: int=10_000, rounds: int=5) -> float:
+    sim = SimulationKernel()
+    sim.add_objs([make_cup(i) for i in range(n)])
+    sim.config_env(Environment(cooling_rate=0.004, evap_rate=0.001,
+                               time_tick=0.01))
+    sim.confirm_setup()
+    return best_time(sim.advance, rounds)
+
+# name -> (label, unit, scale to the unit, measure)
+MEASURES: dict[str, tuple[str, str, float, Callable[[], float]]] = {
+    "cup_bytes": ("Cup (with TeaState)", "bytes", 1,
+                  lambda: bytes_per_entity(make_cup)),
+    "container_bytes": ("Container (with TeaState)", "bytes", 1,
+                        lambda: bytes_per_entity(make_container)),
+    "environment_bytes": ("Environment", "bytes", 1,
+                          lambda: bytes_per_entity(lambda i: Environment())),
+    "advance_seconds": ("advance() over 10k cups", "ms/tick", 1e3,
+                        advance_time),
+}
+
+def run() -> dict:
+    results = {}
+    for name, (label, unit, scale, measure) in MEASURES.items():
+        results[name] = measure()
+        print(f"{label + ':':<27}{results[name] * scale:8.2f} {unit}",
+              file=sys.stderr)
+    return baseline.make_report(results)
+
+def format_value(name: str, value: float) -> str:
+    _, unit, scale, _ = MEASURES[name]
+    return f"{value * scale:8.2f} {unit}"
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.memory",
+        description="Measures the memory per entity and the advance time.")
+    baseline.add_arguments(parser, TOLERANCE)
+    args = parser.parse_args()
+
+    report = run()
+    baseline.finish(report, args, lambda report: report["results"],
+                    format_value)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,69 @@
+import math
+
+class BufferLiquid:
+    """Liquid collected from every pour into one vessel during a tick (see
+    blueprint/interpreter-mechanics.md). The pours are combined into a
+    single liquid of their total volume, volume-weighted temperature and
+    summed tea particles, which `mix` then adds to the vessel in one go.
+
+    The totals are summed exactly with `math.fsum`, so the mixture does not
+    depend on the order in which the pours were added."""
+    __slots__ = ("_volumes", "_heats", "_particles")
+
+    def __init__(self) -> None:
+        self._volumes: list[float] = []
+        self._heats: list[float] = []
+        self._particles: list[float] = []
+
+    def add(self, volume: float, temp: float, particles: float=0.0) -> None:
+        self._volumes.append(volume)
+        self._heats.append(volume * temp)
+        self._particles.append(particles)
+
+    @property
+    def volume(self) -> float:
+        return math.fsum(self._volumes)
+
+    @property
+    def heat(self) -> float:
+        # volume times temperature
+        return math.fsum(self._heats)
+
+    @property
+    def particles(self) -> float:
+        return math.fsum(self._particles)
+
+    @property
+    def temp(self) -> float:
+        volume = self.volume
+        return self.heat / volume if volume > 0 else 0.0
+
+def mix(vol: any, temp: any, particles: any, vol_out: any, vol_in: any,
+        heat_in: any, particles_in: any, capacity: any=None) -> tuple:
+    """Volume, temperature and dissolved tea particles of a vessel after
+    first taking `vol_out` out of it and then pouring in `vol_in` carrying
+    `heat_in` (volume times temperature) and `particles_in`, e.g. the totals
+    of a `BufferLiquid`.
+
+    Liquid poured in beyond `capacity` (the maximum volume minus the tea
+    volume) spills, taking its share of heat and particles with it, so the
+    mixture is unchanged. Works on floats as well as on numpy arrays, one
+    row per vessel."""
+    # the dissolved particles leave in proportion to the volume
+    is_empty = vol == 0
+    particles = particles * (1 - vol_out / (vol + is_empty))
+    kept = vol - vol_out
+    if capacity is not None:
+        room = capacity - kept
+        room = room * (room > 0)
+        # blended rather than branched on so that arrays are handled too
+        is_over = vol_in > room
+        fraction = is_over * room / (vol_in + (vol_in == 0)) + (1 - is_over)
+        vol_in = vol_in * fraction
+        heat_in = heat_in * fraction
+        particles_in = particles_in * fraction
+    new_vol = kept + vol_in
+    # a vessel left empty keeps its temperature
+    is_dry = new_vol == 0
+    temp = (kept * temp + heat_in + is_dry * temp) / (new_vol + is_dry)
+    return new_vol, temp, particles + particles_in
@@ -1,75 +1,88 @@
 from entity import Entity
 from teastate import TeaState
+from vessel_type import ContainerType
 import custom_exceptions as cex
+from schema import Schema, Fields, compile_validator, \
+    compile_batch_validator
 from utils import MIN_TEMP, number
 
 class Container(Entity):
+    # the static parameters are shared through a ContainerType, see
+    # vessel_type
+    __slots__ = ("vessel_type", "is_heater_on", "temp_curr", "vol_curr",
+                 "tea_particle_amount", "tea_content")
+
+    # validation for initialization, ordering here matters (e.g. vol max
+    # first before checking the upper bounds of volume). The static
+    # parameters are bounded by the schema of their record
+    INIT_SCHEMA: Fields = (
+        ("tea_content", Schema(TeaState)),
+        ("vessel_type", Schema(ContainerType)),
+        ("vessel_type.vol_init + tea_content.volume",
+         Schema(number, max_val="vessel_type.vol_max",
+                label="Initial volume plus tea volume",
+                max_label="maximum capacity")),
+        ("tea_particle_amount",
+         Schema(number, min_val=0, label="Tea particle amount")),
+    )
+    # validation of the variables after every update
+    SCHEMA: Fields = (
+        ("tea_content", Schema(TeaState)),
+        ("tea_particle_amount",
+         Schema(number, min_val=0, label="Tea particle amount")),
+        ("temp_curr", Schema(number, min_val=MIN_TEMP,
+                             label="Current temperature",
+                             min_label="absolute zero")),
+        ("vol_curr", Schema(number, min_val=0, label="Current volume")),
+        ("vol_curr + tea_content.volume",
+         Schema(number, max_val="vessel_type.vol_max",
+                label="Current volume plus tea volume",
+                max_label="maximum capacity")),
+    )
+    # compiled once, raising the LowerBoundError or UpperBoundError of the
+    # first violated bound, plus a loop over many vessels for the kernel
+    _init_validate = compile_validator(INIT_SCHEMA, "INIT_SCHEMA",
+                                       "_init_validate")
+    _validate = compile_validator(SCHEMA)
+    _validate_many = staticmethod(compile_batch_validator(SCHEMA))
 
     def __init__(self, id: str, temp_init: float=100.0, vol_init: float=1000.0,
                  vol_max: float=2000.0, heating_rate: float=1.0, is_heater_on: bool=False,
-                 tea_particle_amount: float=0.0, tea_content: TeaState=TeaState(id="")) -> None:
+                 tea_particle_amount: float=0.0,
+                 tea_content: TeaState | None=None) -> None:
         super().__init__(id)
-        self.temp_init = temp_init
-        self.vol_init = vol_init
-        self.vol_max = vol_max
-        self.heating_rate = heating_rate
+        self.vessel_type = ContainerType(temp_init, vol_init, vol_max,
+                                         heating_rate)
         self.is_heater_on = is_heater_on
         # variables
         self.temp_curr = temp_init
         self.vol_curr = vol_init
         self.tea_particle_amount = tea_particle_amount
-        self.tea_content = tea_content
+        # a tea state of its own unless one is given, never a shared default
+        self.tea_content = TeaState(id="") if tea_content is None \
+            else tea_content
         # set up the tea state id if blank
         if not self.tea_content.id:
             self.tea_content.id = id + "_tea_state"
         # finally, validate
         self._init_validate()
 
-    # validation for initialization
-    def _init_validate(self) -> None:
-        # ordering here matters (e.g. vol max first before checking the upper
-        # bounds of volume)
-        # validate the tea state
+    @property
+    def temp_init(self) -> float:
+        return self.vessel_type.temp_init
+
+    @property
+    def vol_init(self) -> float:
+        return self.vessel_type.vol_init
+
+    @property
+    def vol_max(self) -> float:
+        return self.vessel_type.vol_max
 
-        self.tea_content._init_validate()
-        if self.temp_init < MIN_TEMP:
-            raise cex.LowerBoundError(f"Initial temperature ({self.temp_init}) cannot be \
-                                      below absolute zero.")
-        if self.vol_init < 0:
-            raise cex.LowerBoundError(f"Initial volume ({self.vol_init}) cannot \
-                                      be below zero.")
-        if self.vol_max < 0:
-            raise cex.LowerBoundError(f"Maximum volume ({self.vol_max}) \
-                                      cannot be below zero.")
-        if self.vol_init+self.tea_content.volume > self.vol_max:
-            raise cex.UpperBoundError(
-                f"Initial volume ({self.vol_init}) plus tea volume \
-                 cannot be ({self.tea_content.volume}) above maximum capacity.")
-        if self.heating_rate < 0:
-            raise cex.LowerBoundError(f"Heating rate ({self.heating_rate}) cannot \
-                                      be below zero.")
-        if self.tea_particle_amount < 0:
-            raise cex.LowerBoundError(f"Tea particle amount ({self.tea_particle_amount}) \
-                                      cannot be below zero.")
+    @property
+    def heating_rate(self) -> float:
+        return self.vessel_type.heating_rate
 
-    def _validate(self) -> None:
-        """Returns nothing but raises an exception if it encountered a 
-        semantic discrepancy."""
-        # validate the tea state
-        self.tea_content._validate()
-        if self.tea_particle_amount < 0:
-            raise cex.LowerBoundError(f"Tea particle amount ({self.tea_particle_amount}) \
-                                      cannot be below zero.")
-        if self.temp_curr < MIN_TEMP:
-            raise cex.LowerBoundError(f"Current temperature ({self.temp_curr}) cannot \
-                                      be below absolute zero.")
-        if self.vol_curr < 0:
-            raise cex.LowerBoundError(f"Current volume ({self.vol_curr}) cannot be \
-                                      below zero.")
-        if self.vol_curr+self.tea_content.volume > self.vol_max:
-            raise cex.UpperBoundError(f"Current volume ({self.vol_init}) plus tea volume \
-                 cannot be ({self.tea_content.volume}) above maximum capacity.")
-        
     # update a single value from dict
     # also has a checker accompanied
 
@@ -101,6 +114,21 @@ class Container(Entity):
         # check for every update
         self._validate()
 
+    def _clone(self) -> Entity:
+        clone = super()._clone()
+        clone.tea_content = self.tea_content._clone()
+        return clone
+
+    # fast path of update_values for the simulation kernel: applies the
+    # per-tick differentials directly, without building a dict and without
+    # validating (the kernel decides when to validate)
+    def apply_deltas(self, d_temp: float, d_vol: float,
+                     d_particles: float) -> None:
+        self.temp_curr += d_temp
+        self.vol_curr += d_vol
+        self.tea_particle_amount += d_particles
+        self.tea_content.current_particle_amount -= d_particles
+
     # this is actually more of a serialization function
     def to_json(self, show_static: bool=False) -> dict:
         # prepare variable status
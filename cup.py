@@ -1,19 +1,60 @@
 from entity import Entity
 from teastate import TeaState
+from vessel_type import VesselType
 import custom_exceptions as cex
-from utils import MIN_TEMP
+from schema import Schema, Fields, compile_validator, \
+    compile_batch_validator
+from utils import MIN_TEMP, number
 
 class Cup(Entity):
+    # the static parameters are shared through a VesselType, see vessel_type
+    __slots__ = ("vessel_type", "tea_particle_amount", "tea_content",
+                 "vol_curr", "temp_curr")
+
+    # validation for initialization, ordering here matters (e.g. vol max
+    # first before checking the upper bounds of volume). The static
+    # parameters are bounded by the schema of their record
+    INIT_SCHEMA: Fields = (
+        ("tea_content", Schema(TeaState)),
+        ("vessel_type", Schema(VesselType)),
+        ("vessel_type.vol_init + tea_content.volume",
+         Schema(number, max_val="vessel_type.vol_max",
+                label="Initial volume plus tea volume",
+                max_label="maximum capacity")),
+        ("tea_particle_amount",
+         Schema(number, min_val=0, label="Tea particle amount")),
+    )
+    # validation of the variables after every update
+    SCHEMA: Fields = (
+        ("tea_content", Schema(TeaState)),
+        ("tea_particle_amount",
+         Schema(number, min_val=0, label="Tea particle amount")),
+        ("temp_curr", Schema(number, min_val=MIN_TEMP,
+                             label="Current temperature",
+                             min_label="absolute zero")),
+        ("vol_curr", Schema(number, min_val=0, label="Current volume")),
+        ("vol_curr + tea_content.volume",
+         Schema(number, max_val="vessel_type.vol_max",
+                label="Current volume plus tea volume",
+                max_label="maximum capacity")),
+    )
+    # compiled once, raising the LowerBoundError or UpperBoundError of the
+    # first violated bound, plus a loop over many vessels for the kernel
+    _init_validate = compile_validator(INIT_SCHEMA, "INIT_SCHEMA",
+                                       "_init_validate")
+    _validate = compile_validator(SCHEMA)
+    _validate_many = staticmethod(compile_batch_validator(SCHEMA))
+
     def __init__(self, id: str, temp_init: float=0.0, vol_init: float=0.0,
                  vol_max: float=250.0, tea_particle_amount: float=0.0,
-                 tea_content: TeaState=TeaState(id="")) -> None:
+                 tea_content: TeaState | None=None) -> None:
         super().__init__(id)
-        self.temp_init = temp_init
-        self.vol_init = vol_init
-        self.vol_max = vol_max
+        self.vessel_type = VesselType(temp_init, vol_init, vol_max)
         # variables
         self.tea_particle_amount = tea_particle_amount
-        self.tea_content = tea_content
+        # a tea state of its own unless one is given, never a shared default
+        self.tea_content = TeaState(id="") if tea_content is None \
+            else tea_content
         self.vol_curr = vol_init
         self.temp_curr = temp_init
         # set up the tea state id if blank
@@ -21,41 +62,17 @@ class Cup(Entity):
             self.tea_content.id = id + "_tea_state"
         self._init_validate()
 
-    # validation for initialization
-    def _init_validate(self) -> None:
-        # validate the tea state
-        self.tea_content._init_validate()
-        if self.temp_init < MIN_TEMP:
-            raise cex.LowerBoundError(f"Initial temperature ({self.temp_init}) cannot be \
-                                      below absolute zero.")
-        if self.vol_init < 0:
-            raise cex.LowerBoundError(f"Initial volume ({self.vol_init}) cannot \
-                                      be below zero.")
-        if self.vol_max < 0:
-            raise cex.LowerBoundError(f"Maximum volume ({self.vol_max}) \
-                                      cannot be below zero.")
-        if self.vol_init+self.tea_content.volume > self.vol_max:
-            raise cex.UpperBoundError(
-                f"Initial volume ({self.vol_init}) plus tea volume \
-                 cannot be ({self.tea_content.volume}) above maximum capacity.")
-        if self.tea_particle_amount < 0:
-            raise cex.LowerBoundError(f"Tea particle amount ({self.tea_particle_amount}) \
-                                      cannot be below zero.")
-        
-    def _validate(self) -> None:
-        self.tea_content._validate()
-        if self.tea_particle_amount < 0:
-            raise cex.LowerBoundError(f"Tea particle amount ({self.tea_particle_amount}) \
-                                      cannot be below zero.")
-        if self.temp_curr < MIN_TEMP:
-            raise cex.LowerBoundError(f"Current temperature ({self.temp_curr}) cannot \
-                                      be below absolute zero.")
-        if self.vol_curr < 0:
-            raise cex.LowerBoundError(f"Current volume ({self.vol_curr}) cannot be \
-                                      below zero.")
-        if self.vol_curr+self.tea_content.volume > self.vol_max:
-            raise cex.UpperBoundError(f"Current volume ({self.vol_init}) plus tea volume \
-                 cannot be ({self.tea_content.volume}) above maximum capacity.")
+    @property
+    def temp_init(self) -> float:
+        return self.vessel_type.temp_init
+
+    @property
+    def vol_init(self) -> float:
+        return self.vessel_type.vol_init
+
+    @property
+    def vol_max(self) -> float:
+        return self.vessel_type.vol_max
 
     def _update_value(self, dict_key:str, value:any) -> None:
         # only update updatable variables
@@ -82,6 +99,21 @@ class Cup(Entity):
         # check for every update
         self._validate()
 
+    def _clone(self) -> Entity:
+        clone = super()._clone()
+        clone.tea_content = self.tea_content._clone()
+        return clone
+
+    # fast path of update_values for the simulation kernel: applies the
+    # per-tick differentials directly, without building a dict and without
+    # validating (the kernel decides when to validate)
+    def apply_deltas(self, d_temp: float, d_vol: float,
+                     d_particles: float) -> None:
+        self.temp_curr += d_temp
+        self.vol_curr += d_vol
+        self.tea_particle_amount += d_particles
+        self.tea_content.current_particle_amount -= d_particles
+
     def to_json(self, show_static: bool=False) -> dict:
         # prepare variable status
         status = {
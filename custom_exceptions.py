@@ -11,6 +11,9 @@ class InvalidArgumentError(SimulationError):
     """Signifies that custom arguments (e.g. dictionaries) are syntactically
     and/or semantically invalid."""
         
+class InvalidCommandError(InvalidArgumentError):
+    """Raised when a strict command fails verification at commit time."""
+
 class NonExistentObjectError(SimulationError):
     """Signifies that the object being selected does not exist, for example,
     when being queried in an id catalog."""
@@ -42,6 +45,10 @@ class LowerBoundError(ValueOutOfRangeError):
 class UpperBoundError(ValueOutOfRangeError):
     """Raised if a value is above the accepted upper threshold."""
 
+class BackendNotAvailableError(SimulationError):
+    """Raised when an optional backend is selected but its dependency is not
+    installed."""
+
 # schemas
 class SchemaError(Exception):
     """Base schema error."""
@@ -0,0 +1,10 @@
+class SimulationWarning(UserWarning):
+    """Base Class for Simulation Warnings"""
+
+class InvalidCommandWarning(SimulationWarning):
+    """Issued instead of raising when a non-strict command fails verification
+    and is therefore dropped."""
+
+class BackendFallbackWarning(SimulationWarning):
+    """Issued when an optional backend is selected but its dependency is not
+    installed, so that another backend is used instead."""
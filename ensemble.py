@@ -0,0 +1,104 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator
+import itertools
+import os
+from simulation_kernel import SimulationKernel
+from entity import Entity
+from environment import Environment
+from integrators import Integrator
+import custom_exceptions as cex
+
+class ScenarioSpec:
+    """One independent simulation of an ensemble: the entities to add, the
+    environment, and how long to run. Every run works on clones of the
+    entities, so a spec can be run again with the same result."""
+
+    def __init__(self, entities: list[Entity], env: Environment, n_ticks: int,
+                 exact: bool=False, backend: str="object",
+                 integrator: str | Integrator="euler", name: str="") -> None:
+        self.entities = entities
+        self.env = env
+        self.n_ticks = n_ticks
+        self.exact = exact
+        self.backend = backend
+        self.integrator = integrator
+        self.name = name
+
+def scenario_grid(make_entities: Callable[[], list[Entity]], n_ticks: int,
+                  base_env: Environment | None=None, **axes: list) -> list[ScenarioSpec]:
+    """Builds the cartesian product of the given `Environment` fields, e.g.
+    `scenario_grid(make, 1000, cooling_rate=[...], ambient_temp=[...])`.
+    `make_entities` is called once per scenario so that no two scenarios
+    share state."""
+    base_env = base_env or Environment()
+    for field in axes:
+        if field not in Environment.__slots__:
+            raise cex.InvalidArgumentError(
+                f"Environment has no field {field}."
+            )
+    specs = []
+    for values in itertools.product(*axes.values()):
+        env = Environment(
+            cooling_rate=base_env.cooling_rate, ambient_temp=base_env.ambient_temp,
+            time_tick=base_env.time_tick, evap_rate=base_env.evap_rate
+        )
+        settings = dict(zip(axes, values))
+        for field, value in settings.items():
+            setattr(env, field, value)
+        name = ",".join(f"{field}={value}" for field, value in settings.items())
+        specs.append(ScenarioSpec(make_entities(), env, n_ticks, name=name))
+    return specs
+
+def run_scenario(spec: ScenarioSpec) -> dict:
+    """Runs one scenario to completion and returns its final
+    `SimulationKernel.view_status()`."""
+    sim = SimulationKernel(backend=spec.backend, integrator=spec.integrator)
+    # in the calling process the spec would be advanced in place, as it
+    # never is in a worker, which gets a pickled copy
+    sim.add_objs([entity._clone() for entity in spec.entities])
+    sim.config_env(spec.env)
+    sim.confirm_setup()
+    sim.run(spec.n_ticks, spec.exact)
+    return sim.view_status()
+
+def _run_chunk(chunk: list[tuple[int, ScenarioSpec]]) -> list[tuple[int, dict]]:
+    # runs in the worker process
+    return [(index, run_scenario(spec)) for index, spec in chunk]
+
+def run_ensemble(specs: list[ScenarioSpec], workers: int | None=None,
+                 chunksize: int | None=None) -> Iterator[tuple[int, dict]]:
+    """Runs every scenario across a process pool and yields
+    `(index, result)` pairs as soon as their chunk finishes, where `index` is
+    the position of the spec in `specs`.
+
+    Scenarios never interact and every run is deterministic, so the result
+    of each index does not depend on `workers` or `chunksize`, only the
+    order in which they stream in does. With `workers=1` everything runs in
+    the calling process."""
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise cex.InvalidArgumentError(
+            f"Number of workers ({workers}) must be positive."
+        )
+    indexed = list(enumerate(specs))
+    if workers == 1:
+        for index, spec in indexed:
+            yield index, run_scenario(spec)
+        return
+    # a few chunks per worker balances the load without paying for one
+    # round trip per scenario
+    chunksize = chunksize or max(1, len(indexed) // (workers * 4))
+    chunks = [indexed[i:i + chunksize] for i in range(0, len(indexed), chunksize)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def run_ensemble_ordered(specs: list[ScenarioSpec], workers: int | None=None,
+                         chunksize: int | None=None) -> list[dict]:
+    """Like `run_ensemble`, but waits for every scenario and returns the
+    results in the order of `specs`."""
+    results: list[dict | None] = [None] * len(specs)
+    for index, result in run_ensemble(specs, workers, chunksize):
+        results[index] = result
+    return results
@@ -1,4 +1,7 @@
 class Entity:
+    # no per-instance __dict__, subclasses declare their own fields
+    __slots__ = ("id",)
+
     def __init__(self, id: str) -> None:
         self.id = id
 
@@ -14,4 +17,27 @@ class Entity:
     
     def to_json(self, show_static: bool=False) -> dict:
         raise NotImplementedError
+
+    # used by SimulationKernel.fork(), much cheaper than copy.deepcopy since
+    # only the fields themselves are copied. Entities holding other mutable
+    # objects (e.g. a TeaState) clone those as well.
+    def _clone(self) -> "Entity":
+        clone = object.__new__(type(self))
+        for name in _slot_names(type(self)):
+            if hasattr(self, name):
+                setattr(clone, name, getattr(self, name))
+        # subclasses without __slots__ keep the rest in a __dict__
+        if hasattr(self, "__dict__"):
+            clone.__dict__.update(self.__dict__)
+        return clone
+
+_slot_name_cache: dict[type, tuple[str, ...]] = {}
+
+def _slot_names(entity_type: type) -> tuple[str, ...]:
+    if entity_type not in _slot_name_cache:
+        _slot_name_cache[entity_type] = tuple(
+            name for klass in entity_type.__mro__
+            for name in getattr(klass, "__slots__", ()) if name != "__dict__"
+        )
+    return _slot_name_cache[entity_type]
     
@@ -1,4 +1,6 @@
 class Environment():
+    __slots__ = ("cooling_rate", "ambient_temp", "time_tick", "evap_rate")
+
     def __init__(self, cooling_rate: float=1.0, ambient_temp: float=20.0,
                  time_tick: float=1.0, evap_rate: float=1.0) -> None:
         self.cooling_rate = cooling_rate
@@ -0,0 +1,268 @@
+from operator import attrgetter
+import json
+from container import Container
+from cup import Cup
+from entity import Entity
+import custom_exceptions as cex
+from array_backend import np
+
+# orjson encodes numpy columns directly and much faster than the json module,
+# which is only the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# exportable vessel fields, by the attribute they are read from. The fields of
+# the tea state are named like the columns of VesselArrays
+VARIABLE_FIELDS: dict[str, str] = {
+    "temp_curr": "temp_curr",
+    "vol_curr": "vol_curr",
+    "tea_particle_amount": "tea_particle_amount",
+    "current_particle_amount": "tea_content.current_particle_amount",
+    "tea_volume": "tea_content.volume",
+    "is_heater_on": "is_heater_on",
+}
+STATIC_FIELDS: dict[str, str] = {
+    "temp_init": "temp_init",
+    "vol_init": "vol_init",
+    "vol_max": "vol_max",
+    "heating_rate": "heating_rate",
+    "start_particle_count": "tea_content.start_particle_count",
+    "particle_release_rate": "tea_content.particle_release_rate",
+}
+# the variables shown by to_json
+DEFAULT_FIELDS: tuple[str, ...] = ("temp_curr", "vol_curr",
+                                   "tea_particle_amount",
+                                   "current_particle_amount")
+ENCODINGS: tuple[str, ...] = ("columns", "json")
+
+class StateExporter:
+    """Bulk export of the vessels of a kernel as columns rather than one dict
+    per entity:
+
+        {"tick": 120, "since": None, "ids": [...],
+         "temp_curr": [...], "vol_curr": [...], ...}
+
+    where row `i` of every field belongs to `ids[i]`. Containers and cups are
+    read straight from the array backend columns (or with one attribute
+    getter per field from the objects), the other entities are appended
+    under "entities" through their `to_json`.
+
+    Every export keeps a snapshot of the variables it projected, the last
+    `history` of which serve `since`: only the vessels whose projected
+    variables differ from those at that tick are exported. If those fields
+    were not exported at that tick (or it is too old), everything is, which
+    "since" being None in the result tells apart."""
+
+    def __init__(self, kernel: "SimulationKernel", history: int=16) -> None:
+        self._kernel = kernel
+        self._history = history
+        arrays = kernel._arrays
+        if arrays is not None:
+            self._vessels: list[Container | Cup] = list(arrays.entities)
+        else:
+            self._vessels = [entity for entity in kernel._registry.values()
+                             if isinstance(entity, (Container, Cup))]
+        self._others: list[Entity] = [
+            entity for entity in kernel._registry.values()
+            if not isinstance(entity, (Container, Cup))]
+        self._ids: list[str] = [vessel.id for vessel in self._vessels]
+        # cups have no heater
+        self._has_heater: list[bool] = [isinstance(vessel, Container)
+                                        for vessel in self._vessels]
+        # static parameters never change, so they are read once
+        self._static: dict[str, list] = {}
+        # (tick, scenario) -> variables at that export
+        self._snapshots: dict[tuple[int, int], dict] = {}
+        # (tick, scenario) -> values last reported by changes()
+        self._baselines: dict[tuple[int, int], dict] = {}
+
+    def export(self, fields: tuple[str, ...] | list[str] | None=None,
+               since: int | None=None, encoding: str="columns",
+               scenario: int=0) -> dict | bytes:
+        if encoding not in ENCODINGS:
+            raise cex.InvalidArgumentError(
+                f"Encoding {encoding} is not one of {ENCODINGS}."
+            )
+        columns = self.columns(fields, since, scenario)
+        return columns if encoding == "columns" else encode(columns)
+
+    def columns(self, fields: tuple[str, ...] | list[str] | None=None,
+                since: int | None=None, scenario: int=0) -> dict:
+        fields = _check_fields(fields, {**VARIABLE_FIELDS, **STATIC_FIELDS})
+        tick = self._kernel._current_tick
+        variables = {field: self._variable(field, scenario)
+                     for field in fields if field in VARIABLE_FIELDS}
+        previous = self._snapshots.get((since, scenario))
+        if previous is not None and not variables.keys() <= previous.keys():
+            # exported with other fields, so there is nothing to compare to
+            previous = None
+        _remember(self._snapshots, (tick, scenario), variables, self._history)
+        rows = None
+        if previous is not None:
+            rows = _changed_rows(
+                [(variables[field], previous[field]) for field in fields
+                 if field in VARIABLE_FIELDS], len(self._ids))
+        columns = {
+            "tick": tick,
+            # the tick the rows are relative to, None for a full export
+            "since": None if previous is None else since,
+            "ids": self._ids if rows is None else [self._ids[row]
+                                                   for row in rows],
+        }
+        for field in fields:
+            column = variables[field] if field in VARIABLE_FIELDS \
+                else self._static_column(field)
+            columns[field] = column if rows is None else _take(column, rows)
+        if self._others and previous is None:
+            # entities outside the columns are only part of full exports
+            columns["entities"] = {entity.id: entity.to_json()
+                                   for entity in self._others}
+        return columns
+
+    def changes(self, fields: tuple[str, ...] | list[str] | None=None,
+                since: int | None=None, epsilon: float=0.0,
+                scenario: int=0) -> dict:
+        """Per field deltas of the vessels since the watermark `since`, the
+        "tick" of an earlier call:
+
+            {"tick": 130, "since": 120,
+             "changes": {"cup3": {"temp_curr": 71.2}, ...}}
+
+        A field is included once it is more than `epsilon` away from the
+        value last reported for it, so slow drifts add up until they are
+        reported and vessels settled at their equilibrium drop out. If the
+        watermark is unknown, or did not cover every field, every field of
+        every vessel is reported and "since" is None."""
+        fields = _check_fields(fields, VARIABLE_FIELDS)
+        if epsilon < 0:
+            raise cex.InvalidArgumentError(
+                f"Epsilon ({epsilon}) cannot be negative."
+            )
+        tick = self._kernel._current_tick
+        current = {field: self._variable(field, scenario) for field in fields}
+        if np is not None:
+            # the numbers of the object backend are compared as arrays too,
+            # the flags of is_heater_on (None for cups) stay a list
+            current = {field: column if field == "is_heater_on"
+                       else np.asarray(column, dtype=np.float64)
+                       for field, column in current.items()}
+        reported = self._baselines.get((since, scenario))
+        if reported is not None and not current.keys() <= reported.keys():
+            reported = None
+        changes: dict[str, dict] = {}
+        baseline = {}
+        for field, column in current.items():
+            if reported is None:
+                rows = range(len(self._ids))
+                baseline[field] = column
+            else:
+                changed = _differs(column, reported[field], epsilon)
+                rows = _nonzero(changed)
+                # fields that were not reported keep their old value
+                baseline[field] = _where(changed, column, reported[field])
+            values = _take(column, rows)
+            if np is not None and isinstance(values, np.ndarray):
+                values = values.tolist()
+            for row, value in zip(rows, values):
+                changes.setdefault(self._ids[row], {})[field] = value
+        _remember(self._baselines, (tick, scenario), baseline,
+                  self._history)
+        return {"tick": tick, "since": None if reported is None else since,
+                "changes": changes}
+
+    def _variable(self, field: str, scenario: int) -> "np.ndarray | list":
+        arrays = self._kernel._arrays
+        if arrays is None:
+            if field == "is_heater_on":
+                return [getattr(vessel, "is_heater_on", None)
+                        for vessel in self._vessels]
+            return list(map(attrgetter(VARIABLE_FIELDS[field]), self._vessels))
+        column = getattr(arrays, field)
+        if arrays.n_scenarios is not None:
+            column = column[scenario]
+        if field == "is_heater_on":
+            return [bool(is_on) if has_heater else None for is_on, has_heater
+                    in zip(column.tolist(), self._has_heater)]
+        # a copy, since the backend may update its columns in place
+        return column.copy()
+
+    def _static_column(self, field: str) -> list:
+        if field not in self._static:
+            path = STATIC_FIELDS[field]
+            if field == "heating_rate":
+                self._static[field] = [getattr(vessel, path, None)
+                                       for vessel in self._vessels]
+            else:
+                self._static[field] = list(map(attrgetter(path),
+                                               self._vessels))
+        return self._static[field]
+
+def _check_fields(fields: tuple[str, ...] | list[str] | None,
+                  allowed: dict[str, str]) -> tuple[str, ...]:
+    fields = DEFAULT_FIELDS if fields is None else tuple(fields)
+    for field in fields:
+        if field not in allowed:
+            raise cex.InvalidArgumentError(
+                f"Field {field} is not one of {tuple(allowed)}."
+            )
+    return fields
+
+def _remember(history: dict, key: tuple, value: dict, size: int) -> None:
+    # fields taken again at the same tick replace the earlier ones, the
+    # others are kept
+    history[key] = {**history.pop(key, {}), **value}
+    while len(history) > size:
+        # dicts keep insertion order, so this is the oldest
+        del history[next(iter(history))]
+
+def _changed_rows(pairs: list[tuple], n_rows: int) -> list[int]:
+    # rows where any current column differs from its previous one
+    if np is not None and all(isinstance(current, np.ndarray)
+                              for current, _ in pairs):
+        changed = np.zeros(n_rows, dtype=bool)
+        for current, previous in pairs:
+            changed |= current != previous
+        return np.flatnonzero(changed).tolist()
+    return [row for row in range(n_rows)
+            if any(current[row] != previous[row]
+                   for current, previous in pairs)]
+
+def _differs(current: "np.ndarray | list", previous: "np.ndarray | list",
+             epsilon: float) -> "np.ndarray | list":
+    if np is not None and isinstance(current, np.ndarray):
+        return np.abs(current - previous) > epsilon
+    # flags such as is_heater_on (None for cups) only compare equal or not
+    return [value != old if value is None or value is True or value is False
+            else abs(value - old) > epsilon
+            for value, old in zip(current, previous)]
+
+def _nonzero(mask: "np.ndarray | list") -> list[int]:
+    if np is not None and isinstance(mask, np.ndarray):
+        return np.flatnonzero(mask).tolist()
+    return [row for row, is_set in enumerate(mask) if is_set]
+
+def _where(mask: "np.ndarray | list", current: "np.ndarray | list",
+           previous: "np.ndarray | list") -> "np.ndarray | list":
+    if np is not None and isinstance(mask, np.ndarray):
+        return np.where(mask, current, previous)
+    return [value if is_set else old
+            for is_set, value, old in zip(mask, current, previous)]
+
+def _take(column: "np.ndarray | list", rows: list[int]) -> "np.ndarray | list":
+    if np is not None and isinstance(column, np.ndarray):
+        return column[rows]
+    return [column[row] for row in rows]
+
+def encode(columns: dict) -> bytes:
+    """Encodes an export as JSON, numpy columns included."""
+    if orjson is not None:
+        return orjson.dumps(columns, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(columns, default=_to_list).encode()
+
+def _to_list(value: any) -> any:
+    if np is not None and isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON \
+serializable.")
@@ -0,0 +1,189 @@
+from typing import Callable
+import copy
+import custom_exceptions as cex
+import analytic
+
+# A state is a tuple of components, each either a float (one entity) or a
+# numpy array (every entity of the array backend). A derivative maps a state
+# to a tuple of the same shape.
+State = tuple
+Derivative = Callable[[State], State]
+
+def _add(state: State, increment: State, scale: float=1.0) -> State:
+    return tuple(y + scale * dy for y, dy in zip(state, increment))
+
+def _max_abs(value: any) -> float:
+    # works for floats and numpy arrays alike
+    return float(abs(value).max()) if hasattr(value, "max") else abs(value)
+
+class Integrator:
+    """Base class for the ODE integrators used by `SimulationKernel`.
+
+    `increment` returns the change of the state over `duration` rather than
+    the new state, so that it can be fed into `Entity.update_values` as is.
+    """
+    name: str = ""
+
+    def __init__(self) -> None:
+        # number of steps attempted, for benchmarking
+        self.steps_taken: int = 0
+
+    def increment(self, derivative: Derivative, state: State,
+                  duration: float, key: str="") -> State:
+        raise NotImplementedError
+
+    def clone(self) -> "Integrator":
+        """Copy with its own statistics and step size memory, for forked
+        kernels."""
+        clone = copy.copy(self)
+        return clone
+
+    def step_factor(self, z: any) -> any:
+        """Factor by which one step of size h scales the solution of the
+        linear decay y' = -rate * y, where z = rate * h. This lets
+        `SimulationKernel.run` jump over many ticks in closed form while
+        staying consistent with stepping."""
+        raise NotImplementedError
+
+class EulerIntegrator(Integrator):
+    """Forward Euler, the original (and default) scheme of the kernel."""
+    name = "euler"
+
+    def increment(self, derivative: Derivative, state: State,
+                  duration: float, key: str="") -> State:
+        self.steps_taken += 1
+        return tuple(duration * dy for dy in derivative(state))
+
+    def step_factor(self, z: any) -> any:
+        return analytic.euler_step_factor(z)
+
+class RK4Integrator(Integrator):
+    """Classic fourth order Runge-Kutta with one step per tick."""
+    name = "rk4"
+
+    def increment(self, derivative: Derivative, state: State,
+                  duration: float, key: str="") -> State:
+        self.steps_taken += 1
+        h = duration
+        k1 = derivative(state)
+        k2 = derivative(_add(state, k1, h / 2))
+        k3 = derivative(_add(state, k2, h / 2))
+        k4 = derivative(_add(state, k3, h))
+        return tuple(h / 6 * (a + 2 * b + 2 * c + d)
+                     for a, b, c, d in zip(k1, k2, k3, k4))
+
+    def step_factor(self, z: any) -> any:
+        return 1 - z + z ** 2 / 2 - z ** 3 / 6 + z ** 4 / 24
+
+# Dormand-Prince 5(4) tableau, the nodes are not needed since the vessel
+# equations do not depend on time explicitly
+_DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+_DP_B5 = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0)
+_DP_B4 = (5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200,
+          187 / 2100, 1 / 40)
+
+class RK45Integrator(Integrator):
+    """Adaptive Dormand-Prince 5(4) with error control.
+
+    Each tick is covered by as many internal steps as the error estimate
+    requires, never overshooting the tick boundary. The step size is carried
+    over between ticks, so close to `ambient_temp` (where the derivatives
+    vanish) a whole tick is typically done in a single step.
+    """
+    name = "rk45"
+
+    def __init__(self, rtol: float=1e-6, atol: float=1e-9,
+                 max_steps: int=10000) -> None:
+        super().__init__()
+        if rtol <= 0 or atol <= 0:
+            raise cex.InvalidArgumentError(
+                f"Tolerances (rtol={rtol}, atol={atol}) must be positive."
+            )
+        self.rtol = rtol
+        self.atol = atol
+        self.max_steps = max_steps
+        # step size suggested by the last accepted step, per integrated system
+        self._h: dict[str, float] = {}
+
+    def increment(self, derivative: Derivative, state: State,
+                  duration: float, key: str="") -> State:
+        """`key` identifies the system (e.g. the entity id) so that the step
+        size of one entity is not carried over to another."""
+        y = state
+        t = 0.0
+        h = self._h.get(key, duration)
+        steps = 0
+        while t < duration:
+            if steps >= self.max_steps:
+                raise cex.SimulationError(
+                    f"Adaptive integrator exceeded {self.max_steps} steps \
+                    within one tick."
+                )
+            # land exactly on the tick boundary
+            is_last = h >= duration - t
+            step = duration - t if is_last else h
+            y_new, error = self._step(derivative, y, step)
+            scale = max(_max_abs(e) / (self.atol + self.rtol * max(
+                _max_abs(a), _max_abs(b))) for e, a, b in zip(error, y, y_new))
+            steps += 1
+            # standard step size controller with a safety factor
+            growth = 5.0 if scale == 0 else min(5.0, max(0.2, 0.9 * scale ** -0.2))
+            if scale <= 1:
+                t = duration if is_last else t + step
+                y = y_new
+                # a step clipped by the boundary says little about the next one
+                h = max(h, step * growth) if step < h else step * growth
+            else:
+                h = step * growth
+        self.steps_taken += steps
+        self._h[key] = h
+        return tuple(a - b for a, b in zip(y, state))
+
+    def clone(self) -> Integrator:
+        clone = super().clone()
+        clone._h = dict(self._h)
+        return clone
+
+    def _step(self, derivative: Derivative, y: State,
+              h: float) -> tuple[State, State]:
+        stages = []
+        for a_row in _DP_A:
+            y_stage = y
+            for a, k in zip(a_row, stages):
+                if a:
+                    y_stage = _add(y_stage, k, h * a)
+            stages.append(derivative(y_stage))
+        y5 = y
+        error = tuple(0.0 * component for component in y)
+        for b5, b4, k in zip(_DP_B5, _DP_B4, stages):
+            if b5:
+                y5 = _add(y5, k, h * b5)
+            error = _add(error, k, h * (b5 - b4))
+        return y5, error
+
+    def step_factor(self, z: any) -> any:
+        # within its tolerance the adaptive method follows the exact solution
+        return analytic.exact_step_factor(z)
+
+INTEGRATORS: dict[str, type[Integrator]] = {
+    EulerIntegrator.name: EulerIntegrator,
+    RK4Integrator.name: RK4Integrator,
+    RK45Integrator.name: RK45Integrator,
+}
+
+def get_integrator(integrator: str | Integrator) -> Integrator:
+    if isinstance(integrator, Integrator):
+        return integrator
+    if integrator not in INTEGRATORS:
+        raise cex.InvalidArgumentError(
+            f"Integrator {integrator} is not one of {tuple(INTEGRATORS)}."
+        )
+    return INTEGRATORS[integrator]()
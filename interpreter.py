@@ -0,0 +1,492 @@
+from container import Container
+from cup import Cup
+import custom_exceptions as cex
+import custom_warnings as cwa
+from utils import MIN_TEMP
+from buffer_liquid import BufferLiquid, mix
+from registry import EntityRegistry
+import math
+import warnings
+
+# source of a pour that is not a vessel: fresh water at the given temperature
+SPIGOT: str = "spigot"
+
+# arguments of every command as (required, optional), each mapping the name
+# of an argument to its accepted types (tuples, which isinstance checks much
+# faster than utils.number)
+NUMBER: tuple[type, ...] = (int, float)
+COMMAND_SYNTAX: dict[str, tuple[dict[str, tuple], dict[str, tuple]]] = {
+    "pour": ({"from": (str,), "to": (str,), "volume": NUMBER},
+             {"ticks": (int,), "temp": NUMBER}),
+    "discard": ({"from": (str,), "volume": NUMBER}, {}),
+    "add_leaves": ({"to": (str,), "particles": NUMBER}, {"volume": NUMBER}),
+    "toggle_heater": ({"container": (str,)},
+                      {"is_on": (bool,), "period": (int,), "duty": NUMBER,
+                       "cycles": (int,)}),
+}
+
+class Command:
+    """A command issued during the simulation, e.g.
+
+        Command("Player0", "pour", {"from": "Container0", "to": "Cup0",
+                                    "volume": 100})
+
+    Strict commands halt the commit when they are invalid, the others are
+    dropped with an `InvalidCommandWarning`. `ticks` is filled in when the
+    command is verified."""
+    __slots__ = ("agent", "command", "args", "is_strict", "ticks")
+
+    def __init__(self, agent: str, command: str, args: dict,
+                 is_strict: bool=False) -> None:
+        self.agent = agent
+        self.command = command
+        self.args = args
+        self.is_strict = is_strict
+        self.ticks: int = 1
+
+class DeltaObject:
+    """Every change the committed commands make to one vessel during one
+    tick, aggregated over all of them: the volumes taken out, the liquid
+    poured in as one `BufferLiquid`, tea leaves added and the heater
+    setting. Taking out is applied before pouring in."""
+    __slots__ = ("outflows", "liquid", "leaf_particles", "leaf_volume",
+                 "heater")
+
+    def __init__(self) -> None:
+        self.outflows: list[float] = []
+        self.liquid: BufferLiquid = BufferLiquid()
+        self.leaf_particles: float = 0.0
+        self.leaf_volume: float = 0.0
+        self.heater: bool | None = None
+
+    @property
+    def vol_out(self) -> float:
+        return math.fsum(self.outflows)
+
+    def apply(self, vessel: Container | Cup) -> None:
+        tea = vessel.tea_content
+        if self.leaf_particles or self.leaf_volume:
+            tea.current_particle_amount += self.leaf_particles
+            tea.volume += self.leaf_volume
+        liquid = self.liquid
+        vessel.vol_curr, vessel.temp_curr, vessel.tea_particle_amount = mix(
+            vessel.vol_curr, vessel.temp_curr, vessel.tea_particle_amount,
+            self.vol_out, liquid.volume, liquid.heat, liquid.particles,
+            vessel.vol_max - tea.volume)
+        if self.heater is not None:
+            vessel.is_heater_on = self.heater
+
+class ActionBuffer:
+    """Committed commands compiled into per-tick actions.
+
+    Pours are continuous flows over their ticks. Flows between the same
+    source and target are merged into one, so a tick costs one step per
+    pair of vessels no matter how many commands fed it. Discards, tea leaves
+    and heater settings are one-off actions of a single tick. `consume`
+    turns all of them into one `DeltaObject` per touched vessel."""
+
+    def __init__(self) -> None:
+        # (source, target, spigot temperature) -> flows per tick of the
+        # commands pouring, and their total
+        self._flows: dict[tuple, list[float]] = {}
+        self._rates: dict[tuple, float] = {}
+        # tick -> (flow key, change of the flow) starting at that tick
+        self._flow_changes: dict[int, list[tuple[tuple, float]]] = {}
+        # tick -> (action, target, *values) of the one-off actions
+        self._instants: dict[int, list[tuple]] = {}
+        # first tick at which every agent is free again
+        self._busy_until: dict[str, int] = {}
+        # volume and tea volume still to be moved in (or out) of every
+        # vessel, and the last heater setting to come with the number of
+        # settings left, for verifying new commands
+        self._pending_volume: dict[str, float] = {}
+        self._pending_tea_volume: dict[str, float] = {}
+        self._pending_heater: dict[str, list] = {}
+
+    def is_active(self) -> bool:
+        return bool(self._rates or self._flow_changes or self._instants)
+
+    def is_flowing(self) -> bool:
+        # pours in progress change the vessels every tick
+        return bool(self._rates)
+
+    def next_tick(self) -> int | None:
+        """First tick at which an action starts or ends, if any."""
+        ticks = [min(actions) for actions in (self._flow_changes,
+                                              self._instants) if actions]
+        return min(ticks) if ticks else None
+
+    def pending_heater(self, id: str) -> bool | None:
+        pending = self._pending_heater.get(id)
+        return None if pending is None else pending[0]
+
+    def clone(self) -> "ActionBuffer":
+        # the tuples are immutable, only the containers are copied
+        clone = ActionBuffer()
+        clone._flows = {key: list(flows) for key, flows in self._flows.items()}
+        clone._rates = dict(self._rates)
+        clone._flow_changes = {tick: list(changes) for tick, changes
+                               in self._flow_changes.items()}
+        clone._instants = {tick: list(actions) for tick, actions
+                           in self._instants.items()}
+        clone._busy_until = dict(self._busy_until)
+        clone._pending_volume = dict(self._pending_volume)
+        clone._pending_tea_volume = dict(self._pending_tea_volume)
+        clone._pending_heater = {id: list(pending) for id, pending
+                                 in self._pending_heater.items()}
+        return clone
+
+    def add_flow(self, source: str, target: str, temp: float | None,
+                 rate: float, start: int, ticks: int) -> None:
+        key = (source, target, temp)
+        self._flow_changes.setdefault(start, []).append((key, rate))
+        self._flow_changes.setdefault(start + ticks, []).append((key, -rate))
+        volume = rate * ticks
+        if source != SPIGOT:
+            self._pending_volume[source] = \
+                self._pending_volume.get(source, 0.0) - volume
+        self._pending_volume[target] = \
+            self._pending_volume.get(target, 0.0) + volume
+
+    def add_instant(self, tick: int, action: tuple) -> None:
+        self._instants.setdefault(tick, []).append(action)
+        match action:
+            case ("discard", target, volume):
+                self._pending_volume[target] = \
+                    self._pending_volume.get(target, 0.0) - volume
+            case ("add_leaves", target, _, volume):
+                self._pending_tea_volume[target] = \
+                    self._pending_tea_volume.get(target, 0.0) + volume
+            case ("toggle_heater", target, is_on):
+                pending = self._pending_heater.setdefault(target, [is_on, 0])
+                pending[0] = is_on
+                pending[1] += 1
+
+    def consume(self, tick: int, read: any) -> dict[str, DeltaObject]:
+        """Compiles the actions of `tick` into one `DeltaObject` per vessel.
+        `read(id)` returns the (temperature, volume, dissolved particles) of
+        a vessel at the start of the tick, which is what every pour of the
+        tick carries."""
+        changed = set()
+        for key, change in self._flow_changes.pop(tick, ()):
+            if change > 0:
+                self._flows.setdefault(key, []).append(change)
+            else:
+                self._flows[key].remove(-change)
+            changed.add(key)
+        for key in changed:
+            # exact sums, so merged flows do not depend on the commit order
+            if self._flows[key]:
+                self._rates[key] = math.fsum(self._flows[key])
+            else:
+                del self._flows[key]
+                self._rates.pop(key, None)
+        deltas: dict[str, DeltaObject] = {}
+        def delta(id: str) -> DeltaObject:
+            if id not in deltas:
+                deltas[id] = DeltaObject()
+            return deltas[id]
+
+        # one-off actions
+        for action in self._instants.pop(tick, ()):
+            match action:
+                case ("discard", target, volume):
+                    delta(target).outflows.append(volume)
+                    self._pending_volume[target] += volume
+                case ("add_leaves", target, particles, volume):
+                    d = delta(target)
+                    d.leaf_particles += particles
+                    d.leaf_volume += volume
+                    self._pending_tea_volume[target] -= volume
+                case ("toggle_heater", target, is_on):
+                    delta(target).heater = is_on
+                    pending = self._pending_heater[target]
+                    pending[1] -= 1
+                    if pending[1] == 0:
+                        del self._pending_heater[target]
+
+        # a source cannot give more than it holds, every outflow of it is
+        # scaled down alike
+        outflows = {id: list(d.outflows) for id, d in deltas.items()
+                    if d.outflows}
+        for (source, _, _), rate in self._rates.items():
+            if source != SPIGOT:
+                outflows.setdefault(source, []).append(rate)
+        states = {}
+        scale = {}
+        for source, volumes in outflows.items():
+            states[source] = state = read(source)
+            volume = math.fsum(volumes)
+            scale[source] = 1.0 if volume <= state[1] \
+                else max(state[1], 0.0) / volume
+        for id, factor in scale.items():
+            if id in deltas and factor != 1.0:
+                deltas[id].outflows = [volume * factor
+                                       for volume in deltas[id].outflows]
+
+        # subtraction comes first (in `mix`), so each flow is simply added
+        # to both ends, the target collecting its pours in one BufferLiquid
+        for (source, target, temp), rate in self._rates.items():
+            if source == SPIGOT:
+                moved, concentration = rate, 0.0
+            else:
+                moved = rate * scale[source]
+                temp, vol, particles = states[source]
+                concentration = particles / vol if vol > 0 else 0.0
+                delta(source).outflows.append(moved)
+                self._pending_volume[source] += rate
+            delta(target).liquid.add(moved, temp, moved * concentration)
+            self._pending_volume[target] -= rate
+        return deltas
+
+class Interpreter:
+    """Verifies committed commands against the kernel and compiles them into
+    its `ActionBuffer`, following blueprint/interpreter-mechanics.md:
+    verify (syntax check, expound, semantic check, collision check), then
+    process (simplify, batch, order, group and delegate). Batching, ordering
+    and grouping per vessel happen once per tick in `ActionBuffer.consume`.
+
+    Every command of a commit starts on the next tick. Volumes are checked
+    against the state at commit time plus what is already in the buffer,
+    ignoring evaporation."""
+
+    def __init__(self, kernel: any) -> None:
+        self._kernel = kernel
+        self._buffer: ActionBuffer = kernel._actions
+        self._entities: EntityRegistry = kernel._registry
+        # projected volumes of the vessels touched by the commit
+        self._volume: dict[str, float] = {}
+        self._tea_volume: dict[str, float] = {}
+        self._heater: dict[str, bool] = {}
+        self._busy_until: dict[str, int] = {}
+
+    def commit(self, commands: list[Command]) -> int:
+        """Verifies every command and delegates the valid ones to the buffer.
+        Nothing is delegated if a strict command is invalid. Returns the
+        number of commands accepted."""
+        start = self._kernel._current_tick + 1
+        accepted = []
+        for command in commands:
+            try:
+                heater = self._verify(command, start)
+            except cex.InvalidCommandError as error:
+                if command.is_strict:
+                    raise
+                warnings.warn(str(error), cwa.InvalidCommandWarning,
+                              stacklevel=3)
+                continue
+            accepted.append((command, heater))
+        self._process(accepted, start)
+        return len(accepted)
+
+    def _verify(self, command: Command, start: int) -> bool | None:
+        # the checks only record their projections once all of them passed,
+        # so a rejected command leaves no trace; returns the heater setting
+        # of a toggle_heater command
+        self._check_syntax(command)
+        self._expound(command)
+        self._check_collision(command, start)
+        updates, heater = self._check_semantics(command)
+        for id, (vol, tea) in updates.items():
+            self._volume[id] = vol
+            self._tea_volume[id] = tea
+        if heater is not None:
+            self._heater[command.args["container"]] = heater
+        if command.agent:
+            self._busy_until[command.agent] = start + command.ticks
+        return heater
+
+    def _error(self, command: Command, message: str) -> cex.InvalidCommandError:
+        agent = command.agent or "anonymous agent"
+        return cex.InvalidCommandError(
+            f"Command {command.command} of {agent}: {message}"
+        )
+
+    def _check_syntax(self, command: Command) -> None:
+        # both are hashed below, so their types come first
+        if not isinstance(command.command, str):
+            raise self._error(command, "action must be a string.")
+        if not isinstance(command.agent, str):
+            raise self._error(command, "agent must be a string.")
+        if command.command not in COMMAND_SYNTAX:
+            raise self._error(command, f"not one of {tuple(COMMAND_SYNTAX)}.")
+        if not isinstance(command.args, dict):
+            raise self._error(command, "arguments must be a dictionary.")
+        required, optional = COMMAND_SYNTAX[command.command]
+        for name, value in command.args.items():
+            expected = required.get(name) or optional.get(name)
+            if expected is None:
+                raise self._error(command, f"unknown argument {name}.")
+            # bool is a subclass of int but never a number here
+            if not isinstance(value, expected) or \
+                    ((value is True or value is False) and bool not in expected):
+                raise self._error(command, f"argument {name} ({value}) has \
+                                  the wrong type.")
+            # nan slips through every comparison of the semantic check
+            if isinstance(value, float) and not math.isfinite(value):
+                raise self._error(command, f"argument {name} ({value}) must \
+be finite.")
+        for name in required:
+            if name not in command.args:
+                raise self._error(command, f"missing argument {name}.")
+
+    def _expound(self, command: Command) -> None:
+        # implicit fields, currently only the duration of a pour
+        command.ticks = command.args.get("ticks", 1)
+        if command.ticks < 1:
+            raise self._error(command, f"duration ({command.ticks}) must be \
+                              at least one tick.")
+
+    def _vessel(self, command: Command, id: str) -> Container | Cup:
+        entity = self._entities.get(id)
+        if not isinstance(entity, (Container, Cup)):
+            raise self._error(command, f"{id} is not a container or cup.")
+        return entity
+
+    def _projected_volume(self, id: str) -> float:
+        if id not in self._volume:
+            self._volume[id] = self._kernel._read_vessel(id)[1] \
+                + self._buffer._pending_volume.get(id, 0.0)
+        return self._volume[id]
+
+    def _projected_tea_volume(self, vessel: Container | Cup) -> float:
+        if vessel.id not in self._tea_volume:
+            self._tea_volume[vessel.id] = self._kernel._read_tea_volume(
+                vessel.id) + self._buffer._pending_tea_volume.get(vessel.id, 0.0)
+        return self._tea_volume[vessel.id]
+
+    def _take(self, command: Command, vessel: Container | Cup, volume: float,
+              updates: dict) -> None:
+        vol, tea = updates.get(vessel.id) or (self._projected_volume(vessel.id),
+                                              self._projected_tea_volume(vessel))
+        if vol - volume < 0:
+            raise self._error(command, f"{vessel.id} would hold less than \
+                              nothing ({vol - volume}).")
+        updates[vessel.id] = (vol - volume, tea)
+
+    def _fill(self, command: Command, vessel: Container | Cup, volume: float,
+              tea_volume: float, updates: dict) -> None:
+        vol, tea = updates.get(vessel.id) or (self._projected_volume(vessel.id),
+                                              self._projected_tea_volume(vessel))
+        vol, tea = vol + volume, tea + tea_volume
+        if vol + tea > vessel.vol_max:
+            raise self._error(command, f"{vessel.id} would hold {vol} plus \
+                              tea volume {tea}, above its maximum capacity.")
+        updates[vessel.id] = (vol, tea)
+
+    def _check_semantics(self, command: Command) -> tuple[dict, bool | None]:
+        # returns the projected (volume, tea volume) of the vessels the
+        # command touches, and the heater setting it results in
+        args = command.args
+        updates: dict[str, tuple[float, float]] = {}
+        match command.command:
+            case "pour":
+                if args["volume"] <= 0:
+                    raise self._error(command, f"volume ({args['volume']}) \
+                                      must be positive.")
+                if args["from"] == args["to"]:
+                    raise self._error(command, "cannot pour into the source.")
+                target = self._vessel(command, args["to"])
+                if args["from"] == SPIGOT:
+                    if args.get("temp", MIN_TEMP - 1) < MIN_TEMP:
+                        raise self._error(command, "pouring from the spigot \
+                                          needs a temperature above absolute \
+                                          zero.")
+                else:
+                    if "temp" in args:
+                        raise self._error(command, "only the spigot takes a \
+                                          temperature.")
+                    self._take(command, self._vessel(command, args["from"]),
+                               args["volume"], updates)
+                self._fill(command, target, args["volume"], 0.0, updates)
+            case "discard":
+                if args["volume"] <= 0:
+                    raise self._error(command, f"volume ({args['volume']}) \
+                                      must be positive.")
+                self._take(command, self._vessel(command, args["from"]),
+                           args["volume"], updates)
+            case "add_leaves":
+                if args["particles"] < 0 or args.get("volume", 0) < 0:
+                    raise self._error(command, "particles and volume cannot \
+                                      be negative.")
+                self._fill(command, self._vessel(command, args["to"]), 0.0,
+                           args.get("volume", 0.0), updates)
+            case "toggle_heater":
+                container = self._entities.get(args["container"])
+                if not isinstance(container, Container):
+                    raise self._error(command, f"{args['container']} is not \
+                                      a container.")
+                if "period" in args:
+                    return updates, self._check_duty_cycle(command)
+                # without is_on the heater is flipped, which is resolved here
+                # so that the buffer only holds explicit settings
+                is_on = self._heater.get(container.id)
+                if is_on is None:
+                    is_on = self._buffer.pending_heater(container.id)
+                if is_on is None:
+                    is_on = container.is_heater_on
+                return updates, args.get("is_on", not is_on)
+        return updates, None
+
+    def _check_duty_cycle(self, command: Command) -> bool:
+        # a duty cycle switches the heater on for `duty` of every `period`
+        # ticks, `cycles` times, and leaves it as the last cycle ends
+        args = command.args
+        if "is_on" in args:
+            raise self._error(command, "a duty cycle cannot also set is_on.")
+        if args["period"] < 1 or args.get("cycles", 1) < 1:
+            raise self._error(command, "period and cycles must be at least \
+                              one.")
+        if not 0 <= args.get("duty", 0.5) <= 1:
+            raise self._error(command, f"duty ({args['duty']}) must be \
+                              between zero and one.")
+        return self._on_ticks(args) == args["period"]
+
+    def _on_ticks(self, args: dict) -> int:
+        return round(args.get("duty", 0.5) * args["period"])
+
+    def _check_collision(self, command: Command, start: int) -> None:
+        # an agent does one thing at a time, anonymous commands never collide
+        if not command.agent:
+            return
+        busy_until = self._busy_until.get(
+            command.agent, self._buffer._busy_until.get(command.agent, 0))
+        if busy_until > start:
+            raise self._error(command, f"agent is busy until tick \
+                              {busy_until}.")
+
+    def _process(self, commands: list[tuple[Command, bool | None]],
+                 start: int) -> None:
+        buffer = self._buffer
+        for command, heater in commands:
+            args = command.args
+            # simplify every command into flows and one-off actions
+            match command.command:
+                case "pour":
+                    source = args["from"]
+                    temp = args["temp"] if source == SPIGOT else None
+                    buffer.add_flow(source, args["to"], temp,
+                                    args["volume"] / command.ticks, start,
+                                    command.ticks)
+                case "discard":
+                    buffer.add_instant(start, ("discard", args["from"],
+                                               args["volume"]))
+                case "add_leaves":
+                    buffer.add_instant(start, ("add_leaves", args["to"],
+                                               args["particles"],
+                                               args.get("volume", 0.0)))
+                case "toggle_heater" if "period" in args:
+                    period, on_ticks = args["period"], self._on_ticks(args)
+                    for cycle in range(args.get("cycles", 1)):
+                        tick = start + cycle * period
+                        if on_ticks:
+                            buffer.add_instant(tick, ("toggle_heater",
+                                                      args["container"], True))
+                        if on_ticks < period:
+                            buffer.add_instant(tick + on_ticks, (
+                                "toggle_heater", args["container"], False))
+                case "toggle_heater":
+                    buffer.add_instant(start, ("toggle_heater",
+                                               args["container"], heater))
+        for agent, tick in self._busy_until.items():
+            buffer._busy_until[agent] = tick
@@ -0,0 +1,147 @@
+import functools
+import warnings
+from typing import Callable
+from array_backend import VesselArrays, SCHEMA_COLUMNS, np
+from container import Container
+from cup import Cup
+from environment import Environment
+from integrators import Integrator, EulerIntegrator
+from schema import compile_row_condition
+import custom_exceptions as cex
+import custom_warnings as cwa
+
+@functools.cache
+def import_numba() -> any:
+    """The numba module, or None if it is not installed. numba is optional,
+    without it the "jit" backend is the array backend, and only imported
+    once a jit backend is built since the import alone takes a while."""
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba
+
+# one tick of forward Euler and the bounds of Container.SCHEMA, row by row,
+# for as many ticks as it takes. The arithmetic is that of
+# VesselArrays.advance, so both give the same floats
+_FUSED_STEPS = """
+def fused_steps(temp_curr, vol_curr, tea_particle_amount,
+                current_particle_amount, particle_release_rate, heating,
+                tea_volume, vol_max, n_ticks, first_tick, validate_every,
+                time_tick, cooling_rate, ambient_temp, evap_rate):
+    for tick in range(first_tick + 1, first_tick + n_ticks + 1):
+        is_due = validate_every > 0 and tick % validate_every == 0
+        is_violated = False
+        for row in range(temp_curr.shape[0]):
+            delta_temp = temp_curr[row] - ambient_temp
+            dp = time_tick * (particle_release_rate[row]
+                              * current_particle_amount[row])
+            temp_curr[row] += time_tick * (heating[row]
+                                           - cooling_rate * delta_temp)
+            vol_curr[row] -= time_tick * (evap_rate * delta_temp)
+            current_particle_amount[row] -= dp
+            tea_particle_amount[row] += dp
+            if is_due and ({condition}):
+                is_violated = True
+        if is_violated:
+            return tick - first_tick, True
+    return n_ticks, False
+"""
+
+_fused_steps = None
+
+def fused_steps() -> Callable:
+    """The fused loop, compiled by numba on first use (or plain Python
+    without it). It advances the vessel columns in place by up to `n_ticks`
+    and stops after the first tick due for validation at which a row
+    violates a bound, returning (ticks done, whether it stopped)."""
+    global _fused_steps
+    if _fused_steps is None:
+        condition, namespace = compile_row_condition(Container.SCHEMA,
+                                                     SCHEMA_COLUMNS)
+        exec(compile(_FUSED_STEPS.format(condition=condition),
+                     "<jit_backend fused_steps>", "exec"), namespace)
+        _fused_steps = namespace["fused_steps"]
+        numba = import_numba()
+        if numba is not None:
+            _fused_steps = numba.njit(_fused_steps)
+    return _fused_steps
+
+def make_arrays(vessels: list[Container | Cup]) -> VesselArrays:
+    """`JitVesselArrays` over the vessels, or `VesselArrays` with a
+    `BackendFallbackWarning` if numba is not installed."""
+    if import_numba() is None:
+        warnings.warn("Numba is not installed, the jit backend falls back to \
+the array backend.", cwa.BackendFallbackWarning, stacklevel=3)
+        return VesselArrays(vessels)
+    return JitVesselArrays(vessels)
+
+class JitVesselArrays(VesselArrays):
+    """`VesselArrays` advanced by one compiled loop per call instead of a
+    dozen numpy passes per tick, checking the bounds on the way, so that
+    `validate` has nothing left to do after a clean tick. `steps` runs many
+    ticks per call, see `SimulationKernel.step`.
+
+    Only forward Euler is fused, the other integrators take the numpy path
+    of `VesselArrays`, as do batched scenarios."""
+
+    def __init__(self, entity_list: list[Container | Cup],
+                 n_scenarios: int | None=None) -> None:
+        super().__init__(entity_list, n_scenarios)
+        # whether the columns passed the bounds since they last changed
+        self._is_checked: bool = False
+
+    def can_fuse(self, integrator: Integrator) -> bool:
+        return isinstance(integrator, EulerIntegrator) \
+            and self.n_scenarios is None
+
+    def advance(self, env: Environment, integrator: Integrator) -> None:
+        if not self.can_fuse(integrator):
+            self._is_checked = False
+            super().advance(env, integrator)
+            return
+        _, is_violated = self._run(env, 1, 0, 1)
+        integrator.steps_taken += 1
+        self._is_checked = not is_violated
+
+    def steps(self, env: Environment, integrator: Integrator, n_ticks: int,
+              first_tick: int, validate_every: int | None) -> int:
+        """Advances up to `n_ticks` ticks after `first_tick` in one call,
+        checking the bounds every `validate_every` ticks like the kernel
+        would, and returns the number of ticks done. If that is less than
+        `n_ticks`, the last one violated a bound and `validate` raises."""
+        if not self.can_fuse(integrator):
+            raise cex.InvalidArgumentError(
+                f"Integrator {integrator.name} cannot be fused, only euler \
+can."
+            )
+        n_done, _ = self._run(env, n_ticks, first_tick, validate_every or 0)
+        integrator.steps_taken += n_done
+        self._is_checked = False
+        return n_done
+
+    def _run(self, env: Environment, n_ticks: int, first_tick: int,
+             validate_every: int) -> tuple[int, bool]:
+        self._own()
+        heating = self.heating if self.heating is not None \
+            else np.zeros_like(self.temp_curr)
+        n_done, is_violated = fused_steps()(
+            self.temp_curr, self.vol_curr, self.tea_particle_amount,
+            self.current_particle_amount, self.particle_release_rate, heating,
+            self.tea_volume, self.vol_max, n_ticks, first_tick,
+            validate_every, env.time_tick, env.cooling_rate,
+            env.ambient_temp, env.evap_rate)
+        self._synced_scenario = None
+        return n_done, is_violated
+
+    def jump(self, *args: any, **kwargs: any) -> None:
+        self._is_checked = False
+        super().jump(*args, **kwargs)
+
+    def apply_actions(self, *args: any, **kwargs: any) -> None:
+        self._is_checked = False
+        super().apply_actions(*args, **kwargs)
+
+    def validate(self) -> None:
+        if not self._is_checked:
+            super().validate()
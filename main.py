@@ -26,14 +26,13 @@ def main():
 
     pp = pprint.PrettyPrinter(indent=3)
 
-    # run simulation for 10s
-    for i in range(10000):
-        if i % 1000 == 0:
-            sim_status = sim.view_status()
-            print(f"Time: {i//1000}s")
-            pp.pprint(sim_status)
-            print()
-        sim.advance()
+    # run simulation for 10s, jumping 1000 ticks (1s) at a time
+    for i in range(10):
+        sim_status = sim.view_status()
+        print(f"Time: {i}s")
+        pp.pprint(sim_status)
+        print()
+        sim.run(1000)
 
 if __name__=="__main__":
     main()
\ No newline at end of file
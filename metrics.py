@@ -0,0 +1,141 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+class KernelMetrics:
+    """Counters of a `SimulationKernel` with metrics enabled, see
+    `SimulationKernel.enable_metrics`.
+
+    Every phase of a tick is timed on its own: "actions" (the committed
+    commands of the tick), one phase per update function of the dispatch
+    table (e.g. "advance_vessels", or "jump_vessels" within `run`),
+    "validate" and "record". The bound violations that validation raises
+    are counted by exception type."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.phase_seconds: dict[str, float] = {}
+        self.phase_calls: dict[str, int] = {}
+        self.n_ticks: int = 0
+        # entities times ticks (times scenarios for a batched kernel)
+        self.n_entity_ticks: int = 0
+        # wall time spent in advance() and in the jumps of run()
+        self.tick_seconds: float = 0.0
+        self.validation_failures: dict[str, int] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) \
+            + seconds
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    def lap(self, phase: str, since: float) -> float:
+        # adds the time since `since` to the phase and returns the time now
+        now = time.perf_counter()
+        self.add(phase, now - since)
+        return now
+
+    def add_ticks(self, n_ticks: int, n_entities: int, seconds: float) -> None:
+        self.n_ticks += n_ticks
+        self.n_entity_ticks += n_ticks * n_entities
+        self.tick_seconds += seconds
+
+    def count_failure(self, error: Exception) -> None:
+        name = type(error).__name__
+        self.validation_failures[name] = \
+            self.validation_failures.get(name, 0) + 1
+
+    def snapshot(self) -> dict:
+        """The counters as a dict, safe to take from another thread."""
+        seconds = self.tick_seconds
+        phase_calls = dict(self.phase_calls)
+        return {
+            "ticks": self.n_ticks,
+            "entity_ticks": self.n_entity_ticks,
+            "tick_seconds": seconds,
+            "ticks_per_second": self.n_ticks / seconds if seconds else 0.0,
+            "entities_per_second":
+                self.n_entity_ticks / seconds if seconds else 0.0,
+            "phases": {phase: {"seconds": total,
+                               "calls": phase_calls.get(phase, 0)}
+                       for phase, total in dict(self.phase_seconds).items()},
+            "validation_failures": dict(self.validation_failures),
+        }
+
+    def to_prometheus(self, prefix: str="tea_simulation") -> str:
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        def metric(name: str, kind: str, help: str,
+                   samples: list[tuple[str, float]]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+        metric("ticks_total", "counter", "Ticks advanced.",
+               [("", snapshot["ticks"])])
+        metric("entity_ticks_total", "counter",
+               "Entity updates, i.e. entities times ticks.",
+               [("", snapshot["entity_ticks"])])
+        metric("tick_seconds_total", "counter",
+               "Wall time spent advancing the simulation.",
+               [("", snapshot["tick_seconds"])])
+        metric("ticks_per_second", "gauge",
+               "Ticks per second of wall time spent advancing.",
+               [("", snapshot["ticks_per_second"])])
+        metric("entities_per_second", "gauge",
+               "Entity updates per second of wall time spent advancing.",
+               [("", snapshot["entities_per_second"])])
+        phases = snapshot["phases"]
+        metric("phase_seconds_total", "counter",
+               "Wall time spent in each phase of a tick.",
+               [(f'{{phase="{phase}"}}', phases[phase]["seconds"])
+                for phase in phases])
+        metric("phase_calls_total", "counter",
+               "Times each phase of a tick ran.",
+               [(f'{{phase="{phase}"}}', phases[phase]["calls"])
+                for phase in phases])
+        failures = snapshot["validation_failures"]
+        metric("validation_failures_total", "counter",
+               "Bound violations found by validation, by error.",
+               [(f'{{error="{error}"}}', count)
+                for error, count in failures.items()])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str="tea_simulation") -> None:
+        """Writes `to_prometheus` to `path`, e.g. for the textfile collector
+        of the node exporter, replacing the file in one go so that it is
+        never read half written."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(self.to_prometheus(prefix))
+        os.replace(temp_path, path)
+
+    def serve_prometheus(self, host: str="127.0.0.1", port: int=0,
+                         prefix: str="tea_simulation") -> ThreadingHTTPServer:
+        """Serves `to_prometheus` at /metrics from a daemon thread, on a
+        local port (0 picks a free one, see `server_address`). Call
+        `shutdown()` on the returned server to stop it."""
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus(prefix).encode()
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: any) -> None:
+                # scrapes are too frequent to log
+                pass
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
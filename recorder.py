@@ -0,0 +1,210 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from operator import attrgetter
+import json
+import os
+from container import Container
+from cup import Cup
+import custom_exceptions as cex
+from array_backend import np
+
+# fields that can be recorded, all of them vessel variables
+RECORDABLE_FIELDS: tuple[str, ...] = ("temp_curr", "vol_curr",
+                                      "tea_particle_amount",
+                                      "current_particle_amount")
+
+class NpyChunkSink:
+    """Writes every flushed block as one `.npy` file per field into
+    `directory`, next to an `index.json` describing the recording:
+
+        index.json
+        ticks_000000.npy               (n,) int64
+        temp_curr_000000.npy           (n, n_entities) float64
+        ...
+
+    The chunks can be read back (memory-mapped) with `load_chunks`."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._n_chunks: int = 0
+        self._index: dict = {}
+
+    def open(self, ids: list[str], fields: tuple[str, ...],
+             time_tick: float, dtype: str="float64") -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = {"ids": ids, "fields": list(fields), "dtype": dtype,
+                       "time_tick": time_tick, "chunks": []}
+        self._write_index()
+
+    def write(self, ticks: "np.ndarray", columns: dict) -> None:
+        name = f"{self._n_chunks:06d}"
+        np.save(os.path.join(self.directory, f"ticks_{name}.npy"), ticks)
+        for field, block in columns.items():
+            np.save(os.path.join(self.directory, f"{field}_{name}.npy"), block)
+        self._index["chunks"].append(name)
+        self._n_chunks += 1
+        self._write_index()
+
+    def close(self) -> None:
+        pass
+
+    def _write_index(self) -> None:
+        with open(os.path.join(self.directory, "index.json"), "w") as file:
+            json.dump(self._index, file)
+
+def load_chunks(directory: str, field: str) -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns the recorded ticks and the [tick x entity] array of `field`
+    from a `NpyChunkSink` directory."""
+    with open(os.path.join(directory, "index.json")) as file:
+        index = json.load(file)
+    if field != "ticks" and field not in index["fields"]:
+        raise cex.InvalidArgumentError(f"Field {field} was not recorded.")
+    def load(name: str, chunk: str) -> "np.ndarray":
+        return np.load(os.path.join(directory, f"{name}_{chunk}.npy"),
+                       mmap_mode="r")
+    chunks = index["chunks"]
+    if not chunks:
+        return np.empty(0, dtype=np.int64), \
+            np.empty((0, len(index["ids"])), dtype=np.float64)
+    return np.concatenate([load("ticks", chunk) for chunk in chunks]), \
+        np.concatenate([load(field, chunk) for chunk in chunks])
+
+class Recorder:
+    """Records selected vessel variables after every tick into preallocated
+    buffers of `buffer_ticks` rows, which are handed to the sink (and then
+    reused) whenever they fill up. A sink is any object with the
+    `open`/`write`/`close` methods of `NpyChunkSink` (see also
+    `trajectory.TrajectoryWriter`). Memory therefore stays constant however
+    long the simulation runs.
+
+    With `background`, a full buffer is swapped for a second one and written
+    by a worker thread (numpy releases the GIL while writing), so the tick
+    loop only pays for copying the columns. `dtype` can be lowered to
+    float32 to halve both memory traffic and file size, and `every` records
+    only every n-th tick.
+
+    That copy is not free. Measured over 10k vessels, a recorded tick costs
+    about 10% more on the object backend, which reads every field of every
+    vessel in Python, and about twice as much on the array backend, where
+    copying the columns takes as long as the vectorized tick itself. Fewer
+    `fields`, float32 or a larger `every` cut the cost in proportion.
+
+    Attach it with `SimulationKernel.attach_recorder`. A `run()` jump is
+    recorded as a single row at its final tick. Once closed, the recorder
+    ignores further ticks (see also `SimulationKernel.detach_recorder`)."""
+
+    def __init__(self, sink: any, fields: tuple[str, ...]=RECORDABLE_FIELDS,
+                 buffer_ticks: int=1024, background: bool=True,
+                 dtype: str="float64", every: int=1) -> None:
+        if np is None:
+            raise cex.BackendNotAvailableError(
+                "The recorder requires numpy to be installed."
+            )
+        for field in fields:
+            if field not in RECORDABLE_FIELDS:
+                raise cex.InvalidArgumentError(
+                    f"Field {field} is not one of {RECORDABLE_FIELDS}."
+                )
+        if buffer_ticks < 1 or every < 1:
+            raise cex.InvalidArgumentError(
+                f"Buffer size ({buffer_ticks}) and recording interval \
+                ({every}) must be at least one tick."
+            )
+        self.sink = sink
+        self.fields = tuple(fields)
+        self.buffer_ticks = buffer_ticks
+        self.every = every
+        self.dtype = np.dtype(dtype)
+        self._vessels: list[Container | Cup] = []
+        self._arrays = None
+        # (field, getter, objects holding it) for the object backend
+        self._sources: list[tuple[str, attrgetter, list]] = []
+        self._ticks: "np.ndarray | None" = None
+        self._buffers: dict[str, "np.ndarray"] = {}
+        self._position: int = 0
+        # double buffering for the background writer
+        self._executor = ThreadPoolExecutor(max_workers=1) if background \
+            else None
+        self._spare: tuple | None = None
+        self._pending: Future | None = None
+        self._is_closed: bool = False
+
+    def open(self, vessels: list[Container | Cup], arrays: any,
+             time_tick: float) -> None:
+        """Called by the kernel once the setup is confirmed. `arrays` is the
+        kernel's `VesselArrays` if it uses the array backend."""
+        if arrays is not None and arrays.n_scenarios is not None:
+            raise cex.InvalidArgumentError(
+                "Batched kernels cannot be recorded."
+            )
+        self._vessels = vessels if arrays is None else arrays.entities
+        self._arrays = arrays
+        teas = [vessel.tea_content for vessel in self._vessels]
+        self._sources = [
+            (field, attrgetter(field),
+             teas if field == "current_particle_amount" else self._vessels)
+            for field in self.fields
+        ]
+        self._ticks, self._buffers = self._allocate()
+        if self._executor is not None:
+            self._spare = self._allocate()
+        self._position = 0
+        self.sink.open([vessel.id for vessel in self._vessels], self.fields,
+                       time_tick, self.dtype.name)
+
+    def _allocate(self) -> tuple["np.ndarray", dict[str, "np.ndarray"]]:
+        n_entities = len(self._vessels)
+        return np.empty(self.buffer_ticks, dtype=np.int64), {
+            field: np.empty((self.buffer_ticks, n_entities), dtype=self.dtype)
+            for field in self.fields
+        }
+
+    def record(self, tick: int) -> None:
+        if self._is_closed or tick % self.every:
+            return
+        row = self._position
+        self._ticks[row] = tick
+        if self._arrays is not None:
+            # one memcpy per field
+            for field, buffer in self._buffers.items():
+                buffer[row] = getattr(self._arrays, field)
+        else:
+            n_entities = len(self._vessels)
+            for field, getter, objects in self._sources:
+                self._buffers[field][row] = np.fromiter(
+                    map(getter, objects), self.dtype, count=n_entities)
+        self._position += 1
+        if self._position == self.buffer_ticks:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._position == 0:
+            return
+        n = self._position
+        ticks = self._ticks[:n]
+        columns = {field: buffer[:n] for field, buffer in self._buffers.items()}
+        self._position = 0
+        if self._executor is None:
+            self.sink.write(ticks, columns)
+            return
+        # the spare buffers are free again once the previous write is done
+        self._wait()
+        full = (self._ticks, self._buffers)
+        self._ticks, self._buffers = self._spare
+        self._spare = full
+        self._pending = self._executor.submit(self.sink.write, ticks, columns)
+
+    def _wait(self) -> None:
+        if self._pending is not None:
+            # re-raises errors of the writer thread
+            self._pending.result()
+            self._pending = None
+
+    def close(self) -> None:
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self.flush()
+        self._wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self.sink.close()
@@ -0,0 +1,126 @@
+from typing import Iterable, Iterator
+from entity import Entity
+import custom_exceptions as cex
+
+class EntityRegistry:
+    """Every entity of a simulation by id, with secondary indexes by entity
+    type and by tag (e.g. "table3"), so that filtered reads only touch the
+    entities they return.
+
+    Ids are looked up through a hash table, so registering n entities takes
+    O(n) rather than the O(n^2) of searching a list. Every index keeps the
+    order of registration."""
+
+    def __init__(self) -> None:
+        self._entities: dict[str, Entity] = {}
+        self._by_type: dict[type, dict[str, Entity]] = {}
+        self._by_tag: dict[str, dict[str, Entity]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._entities
+
+    def __getitem__(self, id: str) -> Entity:
+        return self._entities[id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entities)
+
+    def get(self, id: str, default: Entity | None=None) -> Entity | None:
+        return self._entities.get(id, default)
+
+    def ids(self) -> list[str]:
+        return list(self._entities)
+
+    def values(self) -> Iterable[Entity]:
+        return self._entities.values()
+
+    def items(self) -> Iterable[tuple[str, Entity]]:
+        return self._entities.items()
+
+    def add(self, entity: Entity, tags: str | Iterable[str]=()) -> None:
+        self.add_many([entity], tags)
+
+    def add_many(self, entity_list: list[Entity],
+                 tags: str | Iterable[str]=()) -> None:
+        """Registers every entity (with the same tags, a single one may be
+        given as a string) or, if any id is taken, none of them."""
+        ids = {}
+        for entity in entity_list:
+            if not isinstance(entity, Entity):
+                raise cex.InvalidArgumentError(
+                    f"Object {str(entity)} not an entity for the simulation."
+                )
+            if entity.id in ids or entity.id in self._entities:
+                raise cex.IdAlreadyExistsError(
+                    f"ID {entity.id} already exists in one of the entities."
+                )
+            ids[entity.id] = entity
+        self._entities.update(ids)
+        for entity in entity_list:
+            self._by_type.setdefault(type(entity), {})[entity.id] = entity
+        for tag in [tags] if isinstance(tags, str) else tags:
+            self._by_tag.setdefault(tag, {}).update(ids)
+
+    def tag(self, id: str, *tags: str) -> None:
+        entity = self._lookup(id)
+        for tag in tags:
+            self._by_tag.setdefault(tag, {})[id] = entity
+
+    def untag(self, id: str, *tags: str) -> None:
+        self._lookup(id)
+        for tag in tags:
+            self._by_tag.get(tag, {}).pop(id, None)
+
+    def tags(self) -> list[str]:
+        return [tag for tag, members in self._by_tag.items() if members]
+
+    def _lookup(self, id: str) -> Entity:
+        if id not in self._entities:
+            raise cex.NonExistentObjectError(
+                "Object with such id does not exist."
+            )
+        return self._entities[id]
+
+    def select(self, ids: Iterable[str] | None=None,
+               types: type | tuple[type, ...] | None=None,
+               tags: str | Iterable[str] | None=None) -> list[Entity]:
+        """Entities matching every given filter: one of `ids`, an instance
+        of one of `types` (subclasses included) and carrying every one of
+        `tags`. Only the smallest candidate set is scanned."""
+        candidates: list[dict[str, Entity]] = []
+        if ids is not None:
+            candidates.append({id: self._lookup(id) for id in ids})
+        if types is not None:
+            types = types if isinstance(types, tuple) else (types,)
+            by_type = {}
+            for entity_type, members in self._by_type.items():
+                if issubclass(entity_type, types):
+                    by_type.update(members)
+            candidates.append(by_type)
+        if tags is not None:
+            for tag in [tags] if isinstance(tags, str) else tags:
+                candidates.append(self._by_tag.get(tag, {}))
+        if not candidates:
+            return list(self._entities.values())
+        smallest = min(candidates, key=len)
+        return [entity for id, entity in smallest.items()
+                if all(id in other for other in candidates
+                       if other is not smallest)]
+
+    def remap(self, entities: dict[str, Entity]) -> "EntityRegistry":
+        """Same indexes over other instances of the same entities, e.g. the
+        clones of `SimulationKernel.fork()`."""
+        registry = EntityRegistry()
+        registry._entities = {id: entities[id] for id in self._entities}
+        registry._by_type = {
+            entity_type: {id: entities[id] for id in members}
+            for entity_type, members in self._by_type.items()
+        }
+        registry._by_tag = {
+            tag: {id: entities[id] for id in members}
+            for tag, members in self._by_tag.items()
+        }
+        return registry
@@ -0,0 +1,277 @@
+from typing import Callable
+import math
+import operator
+from simulation_kernel import SimulationKernel
+from container import Container
+from cup import Cup
+from recorder import RECORDABLE_FIELDS
+import custom_exceptions as cex
+from utils import time_to_tick
+import analytic
+
+COMPARISONS: dict[str, Callable[[float, float], bool]] = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+# an action is either the name of a command, issued through
+# SimulationKernel.cmd, or a callback taking the kernel and the event
+Action = str | Callable[[SimulationKernel, "Event"], None]
+
+class Event:
+    """A timed command or trigger that fired, at the first tick at which it
+    was due."""
+    __slots__ = ("tick", "time", "name")
+
+    def __init__(self, tick: int, time: float, name: str) -> None:
+        self.tick = tick
+        self.time = time
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Event({self.name!r}, tick={self.tick}, time={self.time})"
+
+class _Timed:
+    __slots__ = ("tick", "action", "args", "agent", "is_strict", "name")
+
+    def __init__(self, tick: int, action: Action, args: dict | None,
+                 agent: str, is_strict: bool, name: str) -> None:
+        self.tick = tick
+        self.action = action
+        self.args = args
+        self.agent = agent
+        self.is_strict = is_strict
+        self.name = name
+
+class _Trigger(_Timed):
+    __slots__ = ("id", "field", "compare", "threshold")
+
+    def is_met(self, vessel: Container | Cup) -> bool:
+        return self.compare(_value(vessel, self.field), self.threshold)
+
+def _value(vessel: Container | Cup, field: str) -> float:
+    if field == "current_particle_amount":
+        return vessel.tea_content.current_particle_amount
+    return getattr(vessel, field)
+
+class Scheduler:
+    """Discrete-event driver in front of a `SimulationKernel`.
+
+    Commands can be scheduled at a time (`at`) or when a vessel variable
+    crosses a threshold (`when`). `run_until` jumps straight from one event
+    to the next with the closed-form solution of `SimulationKernel.run`
+    and only steps tick by tick while the kernel cannot jump (e.g. while a
+    pour is flowing).
+
+    A threshold crossing is predicted from the analytical cooling and
+    extraction curves, checked against the closed form of the vessel and,
+    if the prediction was off, searched for by bisection until it is known
+    to within `tolerance` (in the units of `Environment.time_tick`, at
+    least one tick). The trigger fires at the end of that interval, i.e.
+    never before the crossing and at most `tolerance` after it."""
+
+    def __init__(self, kernel: SimulationKernel, tolerance: float | None=None,
+                 exact: bool=False) -> None:
+        if not kernel._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "The setup of the kernel has to be confirmed before \
+                scheduling."
+            )
+        if kernel._arrays is not None and kernel._arrays.n_scenarios is not None:
+            raise cex.InvalidArgumentError(
+                "Batched kernels cannot be scheduled."
+            )
+        self.kernel = kernel
+        self.exact = exact
+        time_tick = kernel._environment.time_tick
+        self._tolerance_ticks: int = 1 if tolerance is None \
+            else max(1, time_to_tick(tolerance, time_tick, False))
+        self._timed: list[_Timed] = []
+        self._triggers: list[_Trigger] = []
+        self.events: list[Event] = []
+
+    def _tick_at(self, time: float) -> int:
+        return time_to_tick(time, self.kernel._environment.time_tick)
+
+    def at(self, time: float, action: Action, args: dict | None=None,
+           agent: str="", is_strict: bool=False, name: str="") -> None:
+        """Issues `action` at the first tick at or after `time`. A command
+        then takes effect from the following tick, as if `cmd()` and
+        `commit()` had been called at that point."""
+        tick = self._tick_at(time)
+        if tick < self.kernel._current_tick:
+            raise cex.InvalidArgumentError(
+                f"Time {time} is before the current simulation time."
+            )
+        self._timed.append(_Timed(tick, action, args, agent, is_strict,
+                                  name or f"{_name(action)} at {time}"))
+        # stable, so actions due on the same tick keep their order
+        self._timed.sort(key=lambda timed: timed.tick)
+
+    def when(self, id: str, field: str, comparison: str, threshold: float,
+             action: Action, args: dict | None=None, agent: str="",
+             is_strict: bool=False, name: str="") -> None:
+        """Issues `action` once, as soon as e.g.
+        `when("container", "temp_curr", "<", 80, ...)` holds."""
+        vessel = self.kernel._registry.get(id)
+        if not isinstance(vessel, (Container, Cup)):
+            raise cex.NonExistentObjectError(
+                f"Container or cup with id {id} does not exist."
+            )
+        if field not in RECORDABLE_FIELDS:
+            raise cex.InvalidArgumentError(
+                f"Field {field} is not one of {RECORDABLE_FIELDS}."
+            )
+        if comparison not in COMPARISONS:
+            raise cex.InvalidArgumentError(
+                f"Comparison {comparison} is not one of {tuple(COMPARISONS)}."
+            )
+        trigger = _Trigger(-1, action, args, agent, is_strict,
+                           name or f"{id}.{field} {comparison} {threshold}")
+        trigger.id = id
+        trigger.field = field
+        trigger.compare = COMPARISONS[comparison]
+        trigger.threshold = threshold
+        self._triggers.append(trigger)
+
+    def run_until(self, time: float) -> list[Event]:
+        """Runs the kernel up to the first tick at or after `time`, firing
+        every event due on the way, and returns those events."""
+        kernel = self.kernel
+        end = self._tick_at(time)
+        if end < kernel._current_tick:
+            raise cex.InvalidArgumentError(
+                f"Time {time} is before the current simulation time."
+            )
+        fired = []
+        while True:
+            fired += self._fire_due()
+            tick = kernel._current_tick
+            if tick >= end:
+                return fired
+            target = end
+            if self._timed:
+                target = min(target, self._timed[0].tick)
+            action_tick = kernel._actions.next_tick()
+            if kernel._actions.is_flowing() or action_tick == tick + 1 \
+                    or not self._can_jump():
+                kernel.advance()
+                continue
+            if action_tick is not None:
+                # the dynamics only stay the same up to the next action
+                target = min(target, action_tick - 1)
+            n_ticks = target - tick
+            if self._triggers:
+                n_ticks = self._first_crossing(n_ticks) or n_ticks
+            kernel.run(n_ticks, self.exact)
+
+    def _can_jump(self) -> bool:
+        kernel = self.kernel
+        if any(jump is None for (_, jump, _), _ in kernel._groups):
+            return False
+        return self.exact or kernel._can_jump(kernel._vessels())
+
+    def _fire_due(self) -> list[Event]:
+        kernel = self.kernel
+        tick = kernel._current_tick
+        due = []
+        while self._timed and self._timed[0].tick <= tick:
+            due.append(self._timed.pop(0))
+        if self._triggers:
+            kernel._sync([trigger.id for trigger in self._triggers])
+            met = [trigger for trigger in self._triggers
+                   if trigger.is_met(kernel._registry[trigger.id])]
+            for trigger in met:
+                self._triggers.remove(trigger)
+            due += met
+        if not due:
+            return []
+        fired = []
+        has_commands = False
+        for timed in due:
+            event = Event(tick, tick * kernel._environment.time_tick, timed.name)
+            if isinstance(timed.action, str):
+                kernel.cmd(timed.action, timed.args, timed.agent,
+                           timed.is_strict)
+                has_commands = True
+            else:
+                timed.action(kernel, event)
+            fired.append(event)
+        if has_commands:
+            kernel.commit()
+        self.events += fired
+        return fired
+
+    def _first_crossing(self, n_ticks: int) -> int | None:
+        # earliest tick (relative to now, within n_ticks) at which any
+        # trigger is met, assuming the dynamics do not change meanwhile
+        kernel = self.kernel
+        kernel._sync([trigger.id for trigger in self._triggers])
+        first = None
+        for trigger in self._triggers:
+            vessel = kernel._registry[trigger.id]
+            horizon = n_ticks if first is None else first
+            crossing = self._find_crossing(trigger, vessel, horizon)
+            if crossing is not None:
+                first = crossing
+        return first
+
+    def _probe(self, vessel: Container | Cup, n_ticks: int) -> Container | Cup:
+        # closed-form state of a single vessel n_ticks ahead
+        clone = vessel._clone()
+        if n_ticks:
+            self.kernel._jump_vessel(clone, n_ticks, self.exact)
+        return clone
+
+    def _find_crossing(self, trigger: _Trigger, vessel: Container | Cup,
+                       horizon: int) -> int | None:
+        def is_met(n: int) -> bool:
+            return trigger.is_met(self._probe(vessel, n))
+        predicted = self._predict(trigger, vessel)
+        if predicted is not None and 1 <= predicted <= horizon:
+            # usually right, which takes two probes
+            if is_met(predicted) and not is_met(predicted - 1):
+                return predicted
+        if not is_met(horizon):
+            # every variable is monotonic between actions, apart from the
+            # volume of a vessel crossing the ambient temperature
+            return None
+        low, high = 0, horizon
+        while high - low > self._tolerance_ticks:
+            middle = (low + high) // 2
+            if is_met(middle):
+                high = middle
+            else:
+                low = middle
+        return high
+
+    def _predict(self, trigger: _Trigger, vessel: Container | Cup) -> int | None:
+        # first tick at or after the crossing of the analytical curve, which
+        # relaxes geometrically towards an equilibrium
+        env = self.kernel._environment
+        tea = vessel.tea_content
+        rate = env.cooling_rate
+        value = _value(vessel, trigger.field)
+        match trigger.field:
+            case "temp_curr":
+                heating = getattr(vessel, "heating_rate", 0.0) \
+                    if getattr(vessel, "is_heater_on", False) else 0.0
+                if rate == 0:
+                    return None
+                equilibrium = env.ambient_temp + heating / rate
+            case "current_particle_amount":
+                rate = tea.particle_release_rate
+                equilibrium = 0.0
+            case "tea_particle_amount":
+                rate = tea.particle_release_rate
+                equilibrium = value + tea.current_particle_amount
+            case _:
+                return None
+        factor = analytic.decay_factor(rate, env.time_tick, 1, self.exact,
+                                       self.kernel._integrator.step_factor)
+        ticks = analytic.crossing_ticks(value, trigger.threshold, equilibrium,
+                                        factor)
+        return None if ticks is None else math.ceil(ticks)
+
+def _name(action: Action) -> str:
+    return action if isinstance(action, str) else getattr(action, "__name__",
+                                                          "callback")
@@ -1,12 +1,24 @@
+from typing import Callable
 import custom_exceptions as cex
+from entity import Entity
 from utils import number
 
 class Schema:
-    def __init__(self, var_type:type, min_val:number=None,
-                  max_val:number=None) -> None:
+    """Type and bounds of one field. The bounds are either numbers or the
+    name of another field of the same entity (e.g. "vol_max"), and `label`,
+    `min_label` and `max_label` describe the field and its bounds in the
+    messages of the compiled validators."""
+
+    def __init__(self, var_type:type, min_val:number | str=None,
+                  max_val:number | str=None, label: str="",
+                  min_label: str | None=None,
+                  max_label: str | None=None) -> None:
         self._type = var_type
         self._min = min_val
         self._max = max_val
+        self.label = label
+        self.min_label = min_label or _describe(min_val)
+        self.max_label = max_label or _describe(max_val)
         # validate
         self._init_validate()
 
@@ -14,13 +26,13 @@ class Schema:
         """
         Validate the initialized schema.
         """
-        if self._min is not None and self._max is not None \
+        if isinstance(self._min, number) and isinstance(self._max, number) \
             and self._min > self._max:
             raise cex.InconsistentBoundsError(
                 f"Minimum value {self._min} is higher than the \
                     maximum value {self._max}"
             )
-        
+
     def validate(self, value: any) -> None:
         # check if type is different
         if not isinstance(value, self._type):
@@ -29,14 +41,151 @@ class Schema:
             )
         # for upper and lower bounds
         if isinstance(value, number):
-            if self._min is not None and self._min > value:
+            if isinstance(self._min, number) and self._min > value:
                 raise cex.InvalidSchemaValueError(
                     f"Minimum value {self._min} is larger than the input value\
                         {value}."
                 )
-            if self._max is not None and self._max < value:
+            if isinstance(self._max, number) and self._max < value:
                 raise cex.InvalidSchemaValueError(
                     f"Input value {value} is larger than the maximum value\
                         {self._max}."
                 )
-            
\ No newline at end of file
+
+    @property
+    def is_entity(self) -> bool:
+        return isinstance(self._type, type) and issubclass(self._type, Entity)
+
+    def is_nested(self, attr: str) -> bool:
+        return isinstance(self._type, type) and hasattr(self._type, attr)
+
+# the fields of an entity, checked in order. A field is an attribute, a
+# dotted path (e.g. "tea_content.volume") or a sum of those, and a field
+# whose schema is a type with fields of its own under the same name is
+# checked through those (e.g. TeaState.SCHEMA within Container.SCHEMA). The
+# fields of a nested entity are reported with its id, those of any other
+# type (e.g. a VesselType) with the id of the entity holding it
+Fields = tuple[tuple[str, Schema], ...]
+
+def _describe(bound: number | str | None) -> str:
+    if bound is None:
+        return ""
+    if isinstance(bound, str):
+        return bound.replace("_", " ")
+    return "zero" if bound == 0 else str(bound)
+
+def _flatten(fields: Fields, attr: str, prefix: str="",
+             owner: str="") -> list[tuple]:
+    # (prefix of the owning entity, prefix of the field, field, schema) with
+    # nested types expanded, e.g. ("tea_content.", "tea_content.tea_type.",
+    # "start_particle_count", ...)
+    flat = []
+    for field, schema in fields:
+        if schema.is_nested(attr):
+            nested = f"{prefix}{field}."
+            flat += _flatten(getattr(schema._type, attr), attr, nested,
+                             nested if schema.is_entity else owner)
+        else:
+            flat.append((owner, prefix, field, schema))
+    return flat
+
+def _expression(prefix: str, field: str, resolve: Callable[[str], str]) -> str:
+    return " + ".join(resolve(prefix + path.strip())
+                      for path in field.split("+"))
+
+def _checks(fields: Fields, attr: str,
+            resolve: Callable[[str], str]) -> tuple[list, dict]:
+    # (value, comparison, bound, error, message, owner prefix) of every bound
+    # as source code, with the constants and messages in a namespace
+    namespace = {"LowerBoundError": cex.LowerBoundError,
+                 "UpperBoundError": cex.UpperBoundError}
+    checks = []
+    for i, (owner, prefix, field, schema) in enumerate(_flatten(fields, attr)):
+        value = _expression(prefix, field, resolve)
+        for bound, side, comparison, error, text in (
+                (schema._min, "min", "<", "LowerBoundError",
+                 f"below {schema.min_label}"),
+                (schema._max, "max", ">", "UpperBoundError",
+                 f"above {schema.max_label}")):
+            if bound is None:
+                continue
+            if isinstance(bound, str):
+                bound_code = resolve(prefix + bound)
+            else:
+                bound_code = f"_{side}{i}"
+                namespace[bound_code] = bound
+            message = f"_{side}_message{i}"
+            namespace[message] = f"{schema.label} ({{}}) of {{}} cannot be {text}."
+            checks.append((value, comparison, bound_code, error, message,
+                           owner))
+    return checks, namespace
+
+def _build(name: str, lines: list[str], namespace: dict) -> Callable:
+    source = "\n".join([f"def {name}(self):"] + (lines or ["    pass"]))
+    exec(compile(source, f"<schema {name}>", "exec"), namespace)
+    return namespace[name]
+
+def compile_validator(fields: Fields, attr: str="SCHEMA",
+                      name: str="_validate") -> Callable:
+    """Compiles `fields` into a single method raising the `LowerBoundError`
+    or `UpperBoundError` of the first violated bound, naming the id of the
+    offending entity. Nested entities are checked inline through their
+    `attr` fields (e.g. "INIT_SCHEMA" for the initial values) rather than
+    through a call to their own validator.
+
+    Types are not checked, they are left to `Schema.validate`."""
+    checks, namespace = _checks(fields, attr, lambda path: f"self.{path}")
+    lines = []
+    for value, comparison, bound, error, message, owner in checks:
+        lines += [
+            f"    value = {value}",
+            f"    if value {comparison} {bound}:",
+            f"        raise {error}({message}.format(value, self.{owner}id))",
+        ]
+    return _build(name, lines, namespace)
+
+def compile_batch_validator(fields: Fields, attr: str="SCHEMA") -> Callable:
+    """Compiles `fields` into a function checking an iterable of entities in
+    one loop, with every bound folded into a single condition. An entity
+    failing it is passed on to its own `_validate` for the exception."""
+    checks, namespace = _checks(fields, attr, lambda path: f"self.{path}")
+    condition = " or ".join(f"{value} {comparison} {bound}"
+                            for value, comparison, bound, *_ in checks)
+    source = "\n".join([
+        "def _validate_many(entities):",
+        "    for self in entities:",
+        f"        if {condition or 'False'}:",
+        "            self._validate()",
+    ])
+    exec(compile(source, "<schema _validate_many>", "exec"), namespace)
+    return namespace["_validate_many"]
+
+def compile_array_validator(fields: Fields, columns: dict[str, str],
+                            attr: str="SCHEMA") -> Callable:
+    """Compiles `fields` into a vectorized method of a column store such as
+    `VesselArrays`, where `columns` maps the dotted fields of nested entities
+    to their columns (e.g. "tea_content.volume" to "tea_volume"). The store
+    provides `_raise_if(mask, error, message, column)`, which maps the first
+    offending row back to its entity."""
+    checks, namespace = _checks(
+        fields, attr, lambda path: f"self.{columns.get(path, path)}")
+    lines = []
+    for value, comparison, bound, error, message, _ in checks:
+        lines += [
+            f"    value = {value}",
+            f"    self._raise_if(value {comparison} {bound}, {error}, \
+{message}, value)",
+        ]
+    return _build("validate", lines, namespace)
+
+def compile_row_condition(fields: Fields, columns: dict[str, str],
+                          attr: str="SCHEMA") -> tuple[str, dict]:
+    """Source of a condition that holds if row `row` of the columns of a
+    store such as `VesselArrays` violates any bound of `fields`, for code
+    generators such as the fused loop of `jit_backend`, with the namespace
+    of its constants. `columns` is as for `compile_array_validator`."""
+    checks, namespace = _checks(
+        fields, attr, lambda path: f"{columns.get(path, path)}[row]")
+    condition = " or ".join(f"{value} {comparison} {bound}"
+                            for value, comparison, bound, *_ in checks)
+    return condition or "False", namespace
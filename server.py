@@ -0,0 +1,383 @@
+import asyncio
+import json
+from typing import AsyncIterator, Iterable
+from simulation_kernel import SimulationKernel
+from interpreter import Command, Interpreter
+from export import encode, orjson
+import custom_exceptions as cex
+
+decode = orjson.loads if orjson is not None else json.loads
+
+class Subscription:
+    """Updates of a `SimulationServer` for one subscriber, as produced by
+    `SimulationKernel.changes`. Iterate over it with `async for`.
+
+    The queue is bounded: when the subscriber falls `maxsize` updates
+    behind, the queued deltas are dropped for one update with the full
+    state ("since" None), so a slow subscriber skips ahead instead of
+    holding up the tick loop or growing without bound."""
+
+    def __init__(self, server: "SimulationServer", maxsize: int) -> None:
+        if not isinstance(maxsize, int) or isinstance(maxsize, bool) \
+                or maxsize < 1:
+            raise cex.InvalidArgumentError(
+                f"Queue size ({maxsize}) must be an integer of at least one."
+            )
+        self._server = server
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        # the first update is always the full state
+        self._needs_full: bool = True
+        self.n_dropped: int = 0
+
+    def _offer(self, update: dict) -> None:
+        # never blocks, called by the tick loop
+        if self._needs_full:
+            update = self._server._full_update()
+        elif self._queue.full():
+            self.n_dropped += self._queue.qsize()
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            update = self._server._full_update()
+        self._needs_full = False
+        self._queue.put_nowait(update)
+
+    def _end(self) -> None:
+        # None ends the iteration, even if the queue is full
+        while self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> dict:
+        update = await self._queue.get()
+        if update is None:
+            raise StopAsyncIteration
+        return update
+
+    def close(self) -> None:
+        self._server._subscriptions.discard(self)
+        self._end()
+
+class SimulationServer:
+    """Runs a `SimulationKernel` in an asyncio task, paced at `ratio`
+    simulated seconds (in the units of `Environment.time_tick`) per second
+    of wall time, or as fast as it goes if `ratio` is None.
+
+    Any number of clients may `submit` commands concurrently. They are
+    committed at the next tick boundary in the order they arrived, one at a
+    time, so that each client learns whether its own command was accepted.
+    After every tick the vessel fields that changed by more than `epsilon`
+    are published to every `Subscription`.
+
+    If the loop falls behind, it catches up by running up to `max_catch_up`
+    ticks at once and drops whatever is left beyond that. `serve` exposes
+    the same over a local TCP or Unix socket, see `SimulationClient`."""
+
+    def __init__(self, kernel: SimulationKernel, ratio: float | None=1.0,
+                 fields: Iterable[str] | None=None, epsilon: float=0.0,
+                 max_catch_up: int=100) -> None:
+        if not kernel._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "The setup of the kernel has to be confirmed before \
+                serving it."
+            )
+        if ratio is not None and ratio <= 0:
+            raise cex.InvalidArgumentError(
+                f"Real-time ratio ({ratio}) must be positive or None."
+            )
+        if max_catch_up < 1:
+            raise cex.InvalidArgumentError(
+                f"Catch-up limit ({max_catch_up}) must be at least one tick."
+            )
+        self.kernel = kernel
+        self.ratio = ratio
+        self.fields: tuple[str, ...] | None = \
+            None if fields is None else tuple(fields)
+        self.epsilon = epsilon
+        self.max_catch_up = max_catch_up
+        self._pending: list[tuple[Command, asyncio.Future]] = []
+        self._subscriptions: set[Subscription] = set()
+        self._task: asyncio.Task | None = None
+        self._watermark: int | None = None
+        # the full state of the current tick, shared by every subscriber that
+        # needs it
+        self._full: dict | None = None
+        self.n_ticks_dropped: int = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.is_running:
+            raise cex.InvalidArgumentError("The server is already running.")
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stops the tick loop and ends every subscription, raising whatever
+        stopped the loop early (e.g. a bounds error)."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._end_subscriptions()
+
+    async def submit(self, action: str, args: dict | None=None,
+                     agent: str="") -> int:
+        """Queues a command for the next tick boundary and returns the tick
+        from which it takes effect, or raises its `InvalidCommandError`."""
+        # messages of remote clients can hold anything, which is rejected
+        # here rather than in the tick loop
+        if not isinstance(action, str) or not isinstance(agent, str) \
+                or not isinstance(args, dict | None):
+            raise cex.InvalidCommandError(
+                f"Command {action!r} of {agent!r}: action and agent must be \
+strings and args a dictionary."
+            )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((Command(agent, action, args or {}, True),
+                              future))
+        return await future
+
+    def subscribe(self, maxsize: int=16) -> Subscription:
+        subscription = Subscription(self, maxsize)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            period = None if self.ratio is None \
+                else self.kernel._environment.time_tick / self.ratio
+            deadline = loop.time()
+            while True:
+                n_ticks = 1
+                if period is not None:
+                    # the tick due now plus any that are overdue
+                    n_ticks += int((loop.time() - deadline) / period)
+                    if n_ticks > self.max_catch_up:
+                        # give up on the ticks that cannot be caught up
+                        self.n_ticks_dropped += n_ticks - self.max_catch_up
+                        deadline += (n_ticks - self.max_catch_up) * period
+                        n_ticks = self.max_catch_up
+                self._commit_pending()
+                if n_ticks == 1:
+                    self.kernel.advance()
+                else:
+                    self.kernel.run(n_ticks)
+                self._publish()
+                if period is None:
+                    # let the clients in between ticks
+                    await asyncio.sleep(0)
+                else:
+                    deadline += n_ticks * period
+                    await asyncio.sleep(max(0.0, deadline - loop.time()))
+        finally:
+            self._fail_pending()
+            self._end_subscriptions()
+
+    def _commit_pending(self) -> None:
+        pending, self._pending = self._pending, []
+        interpreter = Interpreter(self.kernel)
+        start = self.kernel._current_tick + 1
+        for command, future in pending:
+            if future.done():
+                # the client gave up waiting
+                continue
+            try:
+                interpreter.commit([command])
+            except Exception as error:
+                # whatever fails the command fails it alone, never the loop
+                future.set_exception(error)
+            else:
+                future.set_result(start)
+
+    def _fail_pending(self) -> None:
+        pending, self._pending = self._pending, []
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(cex.SimulationNotReadyError(
+                    "The server stopped before the command was committed."
+                ))
+
+    def _publish(self) -> None:
+        self._full = None
+        if not self._subscriptions:
+            self._watermark = None
+            return
+        update = self.kernel.changes(self._watermark, self.fields,
+                                     self.epsilon)
+        self._watermark = update["tick"]
+        for subscription in list(self._subscriptions):
+            subscription._offer(update)
+
+    def _full_update(self) -> dict:
+        if self._full is None:
+            columns = self.kernel.export(self.fields)
+            ids = columns["ids"]
+            fields = [field for field in columns
+                      if field not in ("tick", "since", "ids", "entities")]
+            values = [_to_list(columns[field]) for field in fields]
+            self._full = {
+                "tick": columns["tick"], "since": None,
+                "changes": {id: dict(zip(fields, row))
+                            for id, row in zip(ids, zip(*values))},
+            }
+        return self._full
+
+    def _end_subscriptions(self) -> None:
+        for subscription in list(self._subscriptions):
+            subscription.close()
+
+    async def serve(self, host: str="127.0.0.1", port: int=0,
+                    path: str | None=None) -> asyncio.AbstractServer:
+        """Accepts `SimulationClient` connections on a local TCP port (0
+        picks a free one) or, with `path`, a Unix socket. Each line is one
+        JSON message:
+
+            {"op": "cmd", "id": 1, "action": "pour", "args": {...},
+             "agent": "tool1"}             -> {"id": 1, "tick": 11}
+                                           or {"id": 1, "error": "...",
+                                               "type": "InvalidCommandError"}
+            {"op": "subscribe", "maxsize": 16}  -> {"update": {...}} ...
+
+        A connection subscribes once. Anything else is answered with
+        {"error": "..."}.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle, path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        async def send(message: dict) -> None:
+            # a slow client only holds up its own tasks
+            async with lock:
+                writer.write(encode(message) + b"\n")
+                await writer.drain()
+        async def run_command(message: dict) -> None:
+            try:
+                tick = await self.submit(message.get("action", ""),
+                                         message.get("args"),
+                                         message.get("agent", ""))
+                await send({"id": message.get("id"), "tick": tick})
+            except cex.SimulationError as error:
+                await send({"id": message.get("id"), "error": str(error),
+                            "type": type(error).__name__})
+        async def stream(subscription: Subscription) -> None:
+            async for update in subscription:
+                await send({"update": update})
+        subscription = None
+        try:
+            while line := await reader.readline():
+                try:
+                    message = decode(line)
+                except ValueError:
+                    await send({"error": "Message is not valid JSON."})
+                    continue
+                if not isinstance(message, dict):
+                    await send({"error": "Message is not a JSON object."})
+                    continue
+                match message.get("op"):
+                    case "cmd":
+                        task = asyncio.create_task(run_command(message))
+                    case "subscribe" if subscription is None:
+                        try:
+                            subscription = self.subscribe(
+                                message.get("maxsize", 16))
+                        except cex.InvalidArgumentError as error:
+                            await send({"error": str(error)})
+                            continue
+                        task = asyncio.create_task(stream(subscription))
+                    case "subscribe":
+                        await send({"error": "Connection is already \
+subscribed."})
+                        continue
+                    case op:
+                        await send({"error": f"Operation {op} is not \
+supported."})
+                        continue
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            if subscription is not None:
+                subscription.close()
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+class SimulationClient:
+    """Client side of `SimulationServer.serve`."""
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._next_id: int = 0
+        self._replies: dict[int, asyncio.Future] = {}
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str="127.0.0.1", port: int=0,
+                      path: str | None=None) -> "SimulationClient":
+        if path is not None:
+            return cls(*await asyncio.open_unix_connection(path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def cmd(self, action: str, args: dict | None=None,
+                  agent: str="") -> int:
+        """Same as `SimulationServer.submit`, remotely."""
+        self._next_id += 1
+        id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._replies[id] = future
+        await self._send({"op": "cmd", "id": id, "action": action,
+                          "args": args or {}, "agent": agent})
+        reply = await future
+        if "error" in reply:
+            error = getattr(cex, reply.get("type", ""), cex.SimulationError)
+            raise error(reply["error"])
+        return reply["tick"]
+
+    async def updates(self, maxsize: int=16) -> AsyncIterator[dict]:
+        await self._send({"op": "subscribe", "maxsize": maxsize})
+        while (update := await self._updates.get()) is not None:
+            yield update
+
+    async def close(self) -> None:
+        self._receiver.cancel()
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _send(self, message: dict) -> None:
+        self._writer.write(encode(message) + b"\n")
+        await self._writer.drain()
+
+    async def _receive(self) -> None:
+        try:
+            while line := await self._reader.readline():
+                message = decode(line)
+                if "update" in message:
+                    self._updates.put_nowait(message["update"])
+                elif message.get("id") in self._replies:
+                    self._replies.pop(message["id"]).set_result(message)
+        finally:
+            # the server went away
+            self._updates.put_nowait(None)
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(
+                        "Connection to the simulation server closed."))
+
+def _to_list(column: any) -> list:
+    return column.tolist() if hasattr(column, "tolist") else column
@@ -3,154 +3,824 @@ from entity import Entity
 import custom_exceptions as cex
 from container import Container
 from cup import Cup
-import copy
+from array_backend import VesselArrays
+import jit_backend
+from integrators import Integrator, get_integrator
+from recorder import Recorder
+from registry import EntityRegistry
+from interpreter import ActionBuffer, Command, DeltaObject, Interpreter
+from export import StateExporter
+from metrics import KernelMetrics
+from utils import time_to_tick
+import analytic
+from typing import Callable, Iterable
+import itertools
+import pickle
+import time
+
+BACKENDS: tuple[str, ...] = ("object", "array", "jit")
+
+# signatures of the batched update functions of the dispatch table, see
+# SimulationKernel.register_advance
+AdvanceFunction = Callable[["SimulationKernel", list[Entity]], None]
+JumpFunction = Callable[["SimulationKernel", list[Entity], int, bool], None]
+ValidateFunction = Callable[["SimulationKernel", list[Entity]], None]
 
 class SimulationKernel():
-    def __init__(self) -> None:
-        self._entity_dict: dict[str, Entity] = {}
+    # dispatch table shared by all kernels, mapping an entity type to its
+    # (advance, jump, validate) functions
+    _advance_table: dict[type, tuple[AdvanceFunction, JumpFunction | None,
+                                     ValidateFunction]] = {}
+
+    def __init__(self, backend: str="object",
+                 integrator: str | Integrator="euler",
+                 validate_every: int | None=1, lazy: bool=False) -> None:
+        if backend not in BACKENDS:
+            raise cex.InvalidArgumentError(
+                f"Backend {backend} is not one of {BACKENDS}."
+            )
+        if lazy and backend != "object":
+            raise cex.InvalidArgumentError(
+                f"Backend {backend} advances every vessel at once, only the \
+object backend can be lazy."
+            )
+        if validate_every is not None and validate_every < 1:
+            raise cex.InvalidArgumentError(
+                f"Validation interval ({validate_every}) must be at least one \
+                tick or None."
+            )
+        # every entity by id, type and tag
+        # I believe it's a fundamental principle that we shouldn't assign
+        # ids automatically
+        self._registry: EntityRegistry = EntityRegistry()
+        # the vessel owning each tea state, by the id() of the tea state
+        self._tea_owners: dict[int, str] = {}
         self._environment: Environment = Environment()
-        # we replaced id handling with a simple list
-        # but I believe it's a fundamental principle that we shouldn't
-        # assign ids automatically
-        self._id_list: list[str] = []
         self._is_ready_to_run: bool = False
         self._current_tick: int = 0
+        # "object" advances each entity through update_values, "array" keeps
+        # the vessel variables in numpy columns and advances them in one go,
+        # "jit" advances those columns in one loop compiled by numba
+        self._backend: str = backend
+        self._arrays: VesselArrays | None = None
+        # ODE scheme used for every tick, see integrators.INTEGRATORS
+        self._integrator: Integrator = get_integrator(integrator)
+        # bounds are checked every `validate_every` ticks, at the end of run()
+        # and whenever validate() is called, or only in the latter case if None
+        self._validate_every: int | None = validate_every
+        # entities grouped by their update functions, set by confirm_setup()
+        self._groups: list[tuple[tuple, list[Entity]]] = []
+        # recorders are fed after every tick, see attach_recorder
+        self._recorders: list[Recorder] = []
+        # commands issued since the last commit, and the committed ones
+        # compiled into per-tick actions, see cmd and commit
+        self._commands: list[Command] = []
+        self._actions: ActionBuffer = ActionBuffer()
+        # bulk serialization, created by the first export()
+        self._exporter: StateExporter | None = None
+        # set by enable_metrics
+        self._metrics: KernelMetrics | None = None
+        # with `lazy`, the tick each vessel was last brought forward to. A
+        # tick then costs nothing per vessel, and a vessel catches up in
+        # closed form when it is observed or touched, see _materialize
+        self._last_ticks: dict[str, int] | None = {} if lazy else None
+
+    def add_obj(self, entity: Entity, tags: str | Iterable[str]=()) -> None:
+        self.add_objs([entity], tags)
 
-    def add_obj(self, entity: Entity) -> None:
+    def add_objs(self, entity_list: list[Entity],
+                 tags: str | Iterable[str]=()) -> None:
+        """Adds the entities, each carrying `tags` (e.g. "table3") for the
+        filters of `view_status`. Either all of them are added or, if an id
+        already exists or two vessels share a tea state, none."""
         if self._is_ready_to_run:
             raise cex.SimulationNotReadyError(
                 "Method cannot be invoked without \
                 SimulationKernel.confirm_setup() having successfully called \
                 beforehand."
             )
-        else:
-            # first check if the id is present in the list
-            if entity.id in self._id_list:
-                raise cex.IdAlreadyExistsError(
-                    f"ID {entity.id} already exists in one of the entities."
+        # vessels mutate their tea state, so one shared by two of them would
+        # silently couple them
+        owners = {}
+        for entity in entity_list:
+            tea = getattr(entity, "tea_content", None)
+            if tea is None:
+                continue
+            owner = self._tea_owners.get(id(tea)) or owners.get(id(tea))
+            if owner is not None:
+                raise cex.InvalidArgumentError(
+                    f"Tea state {tea.id} of {entity.id} already belongs to \
+{owner}."
                 )
-            self._id_list.append(entity.id)
-            # and therefore add the entity
-            self._entity_dict[entity.id] = entity
+            owners[id(tea)] = entity.id
+        self._registry.add_many(entity_list, tags)
+        self._tea_owners.update(owners)
 
-    def add_objs(self, entity_list: list[Entity]) -> None:
-        for entity in entity_list:
-            self.add_obj(entity)
+    def tag(self, id: str, *tags: str) -> None:
+        """Adds tags to an entity, also after the setup is confirmed."""
+        self._registry.tag(id, *tags)
+
+    def untag(self, id: str, *tags: str) -> None:
+        self._registry.untag(id, *tags)
 
     def config_env(self, env: Environment) -> None:
         self._environment = env
 
+    @classmethod
+    def register_advance(cls, entity_type: type, advance: AdvanceFunction,
+                         jump: JumpFunction | None=None,
+                         validate: ValidateFunction | None=None) -> None:
+        """Registers the batched update of `entity_type` (and of its
+        subclasses, unless they register their own).
+
+        `advance(kernel, entities)` advances every entity of the group by one
+        tick without validating. The optional `jump(kernel, entities, n_ticks,
+        exact)` advances them by `n_ticks` at once for `run()`, otherwise
+        `run()` steps the group tick by tick. `validate(kernel, entities)`
+        checks the bounds of the group, by default through each
+        `Entity._validate`."""
+        if not (isinstance(entity_type, type) and issubclass(entity_type, Entity)):
+            raise cex.InvalidArgumentError(
+                f"Object {str(entity_type)} is not an entity type."
+            )
+        cls._advance_table[entity_type] = (
+            advance, jump, validate or SimulationKernel._validate_entities)
+
+    def _lookup_advance(self, entity: Entity) -> tuple:
+        if not isinstance(entity, Entity):
+            raise cex.InvalidArgumentError(
+                f"Object {str(entity)} not an entity for the simulation."
+            )
+        # the most specific registered base class wins
+        for entity_type in type(entity).__mro__:
+            if entity_type in self._advance_table:
+                return self._advance_table[entity_type]
+        raise cex.EntityTypeNotSupportedError(
+            f"Update for the entity type of {entity.id} is not supported."
+        )
+
     def confirm_setup(self) -> None:
         if self._is_ready_to_run:
             raise cex.SetupAlreadyConfirmedError(
                 "Method invoked again when the simulation setup is already \
                 confirmed."
             )
+        # group the entities by their update functions once, so that a tick
+        # dispatches per group instead of per entity
+        groups: dict[tuple, list[Entity]] = {}
+        for entity in self._registry.values():
+            groups.setdefault(self._lookup_advance(entity), []).append(entity)
+        self._groups = list(groups.items())
+        if self._backend != "object":
+            self._arrays = self._make_arrays(self._vessels())
+        if self._last_ticks is not None:
+            self._last_ticks = {vessel.id: self._current_tick
+                                for vessel in self._vessels()}
         self._is_ready_to_run = True
 
+        for recorder in self._recorders:
+            self._open_recorder(recorder)
+
+    def _make_arrays(self, vessels: list[Container | Cup]) -> VesselArrays:
+        if self._backend == "jit":
+            return jit_backend.make_arrays(vessels)
+        return VesselArrays(vessels)
+
+    def _vessels(self) -> list[Container | Cup]:
+        return [entity for (advance, _, _), entities in self._groups
+                if advance is SimulationKernel._advance_vessels
+                for entity in entities]
+
+    def attach_recorder(self, recorder: Recorder) -> None:
+        """Records the vessel variables after every tick, starting with the
+        state at the time the setup is confirmed (or now, if it already is).
+        Call `detach_recorder` (or `recorder.close()`) to flush the last
+        rows."""
+        if self._last_ticks is not None:
+            raise cex.InvalidArgumentError(
+                "Recorders take every vessel at every tick, which a lazy \
+kernel does not compute."
+            )
+        self._recorders.append(recorder)
+        if self._is_ready_to_run:
+            self._open_recorder(recorder)
+
+    def detach_recorder(self, recorder: Recorder) -> None:
+        """Stops recording into `recorder` and closes it."""
+        if recorder not in self._recorders:
+            raise cex.InvalidArgumentError(
+                "Recorder is not attached to this simulation."
+            )
+        self._recorders.remove(recorder)
+        recorder.close()
+
+    def _open_recorder(self, recorder: Recorder) -> None:
+        recorder.open(self._vessels(), self._arrays,
+                      self._environment.time_tick)
+        recorder.record(self._current_tick)
+
     def advance(self) -> None:
         if not self._is_ready_to_run:
             raise cex.SimulationNotReadyError(
                 "Method cannot be invoked due to simulation not fully set up \
                 properly."
             )
-        # I am not sure if this will cause an error 
-        # because we are modifying the dictionary that we are looping
-        # if that happens, we might do a double buffer approach
-        for id, entity in self._entity_dict.items():
-            if isinstance(entity, Entity):
-                if isinstance(entity, Container):
-                    self._advance_container(self._entity_dict[id])
-                elif isinstance(entity, Cup):
-                    self._advance_cup(self._entity_dict[id])
-                else:
-                    raise cex.EntityTypeNotSupportedError(
-                        "Update for this entity type is not supported."
-                    )
+        # with metrics enabled every phase is timed, see enable_metrics
+        metrics = self._metrics
+        first_tick = self._current_tick
+        start = last = time.perf_counter() if metrics is not None else 0.0
+        try:
+            if self._actions.is_active():
+                self._apply_actions(self._actions.consume(
+                    self._current_tick + 1, self._read_vessel))
+                if metrics is not None:
+                    last = metrics.lap("actions", last)
+            for (advance, _, _), entities in self._groups:
+                advance(self, entities)
+                if metrics is not None:
+                    last = metrics.lap(_phase(advance), last)
+            self._current_tick += 1
+            if self._is_validation_due(self._current_tick):
+                self._validate_due()
+            self._record()
+        finally:
+            if metrics is not None:
+                # a tick that failed validation still happened
+                metrics.add_ticks(self._current_tick - first_tick,
+                                  self._n_updated(),
+                                  time.perf_counter() - start)
+
+    def validate(self) -> None:
+        """Checks the bounds of every entity, raising the `LowerBoundError` or
+        `UpperBoundError` of the first offending one. Called by the kernel
+        according to `validate_every`, or as a checkpoint by the user.
+
+        A lazy kernel brings every vessel forward to check it."""
+        self._validate_groups(self._groups)
+
+    def _validate_due(self) -> None:
+        # validation on the schedule of `validate_every`, which leaves lazy
+        # vessels to be checked as they are brought forward
+        if self._last_ticks is None:
+            self.validate()
+            return
+        self._validate_groups([
+            group for group in self._groups
+            if group[0][0] is not SimulationKernel._advance_vessels])
+
+    def _validate_groups(self, groups: list[tuple[tuple, list[Entity]]]) \
+            -> None:
+        metrics = self._metrics
+        start = time.perf_counter() if metrics is not None else 0.0
+        try:
+            for (_, _, validate), entities in groups:
+                validate(self, entities)
+        except cex.ValueOutOfRangeError as error:
+            if metrics is not None:
+                metrics.count_failure(error)
+            raise
+        finally:
+            if metrics is not None:
+                metrics.lap("validate", start)
+
+    def _record(self) -> None:
+        if not self._recorders:
+            return
+        start = time.perf_counter()
+        for recorder in self._recorders:
+            recorder.record(self._current_tick)
+        if self._metrics is not None:
+            self._metrics.lap("record", start)
+
+    def _is_validation_due(self, tick: int) -> bool:
+        return self._validate_every is not None \
+            and tick % self._validate_every == 0
+
+    def _validate_entities(self, entities: list[Entity]) -> None:
+        # entities are mostly added in runs of one type, each of which is
+        # checked by the compiled loop of its class where there is one
+        for entity_type, run in itertools.groupby(entities, type):
+            validate_many = getattr(entity_type, "_validate_many", None)
+            if validate_many is None:
+                for entity in run:
+                    entity._validate()
             else:
-                raise cex.InvalidArgumentError(
-                    f"Object {str(entity)} not an entity for the simulation."
-                )
+                validate_many(run)
+
+    def _validate_vessels(self, vessels: list[Container | Cup]) -> None:
+        if self._last_ticks is not None:
+            tick = self._current_tick
+            current = [vessel for vessel in vessels
+                       if self._last_ticks[vessel.id] == tick]
+            self._materialize([vessel.id for vessel in vessels], True)
+            self._validate_entities(current)
+            return
+        if self._arrays is not None:
+            self._arrays.validate()
+        else:
+            self._validate_entities(vessels)
+
+    def _advance_vessels(self, vessels: list[Container | Cup]) -> None:
+        if self._last_ticks is None:
+            self._step_vessels(vessels)
 
-    def _advance_container(self, container: Container) -> None:
+    def _step_vessels(self, vessels: list[Container | Cup]) -> None:
         # for easier reference
         env = self._environment
-        # calculate the differentials
-        # there are overridable constants if we specify but we assume that the
-        # constants to be used are from the environment
-        # for example, cooling rate may differ per entity
-        dT = env.cooling_rate * (container.temp_curr - env.ambient_temp)
-        dV = env.evap_rate * (container.temp_curr - env.ambient_temp)
-        dp = container.tea_content.particle_release_rate \
-            * container.tea_content.current_particle_amount
-        # apply time tick
-        dT *= env.time_tick
-        dV *= env.time_tick
-        dp *= env.time_tick
-        
-        # update the variables
-        container.update_values({
-            "temp_curr": -dT,
-            "vol_curr": -dV,
-            "tea_content": {
-                "current_particle_amount": -dp
-            },
-            "tea_particle_amount": dp
-        })
-        
-        # clamp the contents of the container
-        # container.correct_values()
-
-    def _advance_cup(self, cup: Cup) -> None:
-        # for easier reference
+        if self._arrays is not None:
+            self._arrays.advance(env, self._integrator)
+            return
+        increment = self._integrator.increment
+        time_tick = env.time_tick
+        for vessel in vessels:
+            tea = vessel.tea_content
+            # calculate the differentials over one tick
+            # there are overridable constants if we specify but we assume that
+            # the constants to be used are from the environment
+            # for example, cooling rate may differ per entity
+            derivative = analytic.vessel_derivative(env, tea.particle_release_rate,
+                                                    _heating(vessel))
+            dT, dV, dp, _ = increment(
+                derivative,
+                (vessel.temp_curr, vessel.vol_curr, vessel.tea_particle_amount,
+                 tea.current_particle_amount),
+                time_tick, vessel.id)
+            # update the variables, validation is left to the kernel
+            vessel.apply_deltas(dT, dV, dp)
+
+    def enable_metrics(self, metrics: KernelMetrics | None=None) -> KernelMetrics:
+        """Times every phase of `advance`, `step` and `run` and counts the
+        ticks and the validation failures into `metrics` (a new
+        `KernelMetrics` if None), which is returned. See
+        `KernelMetrics.snapshot` and `KernelMetrics.to_prometheus`.
+
+        Without metrics the timing costs one check per phase."""
+        self._metrics = metrics or KernelMetrics()
+        return self._metrics
+
+    def disable_metrics(self) -> None:
+        self._metrics = None
+
+    @property
+    def metrics(self) -> KernelMetrics | None:
+        return self._metrics
+
+    def _n_updated(self) -> int:
+        # entities updated per tick, in every scenario of a batched kernel
+        n_entities = sum(len(entities) for _, entities in self._groups)
+        if self._arrays is not None and self._arrays.n_scenarios is not None:
+            n_entities *= self._arrays.n_scenarios
+        return n_entities
+
+    def step(self, n_ticks: int) -> None:
+        """Advances the simulation by `n_ticks` tick by tick, with the same
+        result as calling `advance()` `n_ticks` times. The "jit" backend runs
+        the ticks in between actions in one compiled call (without
+        recorders attached, which take every tick, and without entity types
+        of their own update functions), the other backends call
+        `advance()`."""
+        if not self._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "Method cannot be invoked due to simulation not fully set up \
+                properly."
+            )
+        if n_ticks < 0:
+            raise cex.InvalidArgumentError(
+                f"Number of ticks ({n_ticks}) cannot be negative."
+            )
+        end = self._current_tick + n_ticks
+        while self._current_tick < end:
+            next_tick = self._actions.next_tick()
+            if not self._can_fuse() or self._actions.is_flowing() \
+                    or next_tick == self._current_tick + 1:
+                self.advance()
+            elif next_tick is None or next_tick > end:
+                self._step_fused(end - self._current_tick)
+            else:
+                self._step_fused(next_tick - 1 - self._current_tick)
+
+    def _can_fuse(self) -> bool:
+        # other groups would have to be stepped apart from the vessels and
+        # the tick, see _jump
+        return isinstance(self._arrays, jit_backend.JitVesselArrays) \
+            and self._arrays.can_fuse(self._integrator) \
+            and not self._recorders \
+            and all(advance is SimulationKernel._advance_vessels
+                    for (advance, _, _), _ in self._groups)
+
+    def _step_fused(self, n_ticks: int) -> None:
+        metrics = self._metrics
+        first_tick = self._current_tick
+        start = time.perf_counter() if metrics is not None else 0.0
+        try:
+            n_done = self._arrays.steps(self._environment, self._integrator,
+                                        n_ticks, self._current_tick,
+                                        self._validate_every)
+            if metrics is not None:
+                metrics.lap("step_fused", start)
+            self._current_tick += n_done
+            if n_done < n_ticks:
+                # raises for the tick that violated a bound
+                self.validate()
+        finally:
+            if metrics is not None:
+                metrics.add_ticks(self._current_tick - first_tick,
+                                  self._n_updated(),
+                                  time.perf_counter() - start)
+
+    def run(self, n_ticks: int, exact: bool=False) -> None:
+        """Advances the simulation by `n_ticks` in one jump.
+
+        By default the jump uses the closed form of the per-tick recurrence
+        that `advance()` steps through, so the result agrees with calling
+        `advance()` `n_ticks` times up to floating-point rounding (relative
+        error well below 1e-9 for millions of ticks). With `exact`, the exact
+        exponential solution of the ODE is used instead, which differs from
+        the stepped path by at most `|T - ambient_temp| * n_ticks *
+        (cooling_rate * time_tick) ** 2 / 2` in temperature (and likewise
+        for the particles). If the stepped recurrence is not monotonic
+        (e.g. a rate times `time_tick` above one for forward Euler), this
+        falls back to stepping.
+
+        The stepped recurrence is that of the kernel's integrator. For the
+        adaptive integrator this is the exact solution, which it follows
+        within its tolerances. If any entity type was registered without a
+        jump function, the whole range is stepped through `advance()`, so
+        that the current tick and every entity agree when a tick fails
+        validation.
+
+        Committed commands take effect on their ticks: the simulation jumps
+        from one action (e.g. a heater being switched) to the next and only
+        steps through the ticks of a pour.
+        """
+        if not self._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "Method cannot be invoked due to simulation not fully set up \
+                properly."
+            )
+        if n_ticks < 0:
+            raise cex.InvalidArgumentError(
+                f"Number of ticks ({n_ticks}) cannot be negative."
+            )
+        end = self._current_tick + n_ticks
+        while self._current_tick < end:
+            next_tick = self._actions.next_tick()
+            if self._actions.is_flowing() or next_tick == self._current_tick + 1:
+                # advance() consumes the actions of the tick
+                self.advance()
+            elif next_tick is None or next_tick > end:
+                self._jump(end - self._current_tick, exact)
+            else:
+                self._jump(next_tick - 1 - self._current_tick, exact)
+
+    def _jump(self, n_ticks: int, exact: bool) -> None:
+        # the groups do not interact, so each one can be brought forward on
+        # its own, unless one of them has to be stepped. That one is stepped
+        # in lockstep with the others and the tick, so that a failed
+        # validation leaves all of them at the tick it reports
+        if not self._is_jumpable(exact):
+            for _ in range(n_ticks):
+                self.advance()
+            return
+        metrics = self._metrics
+        first_tick = self._current_tick
+        start = last = time.perf_counter() if metrics is not None else 0.0
+        try:
+            for (_, jump, _), entities in self._groups:
+                jump(self, entities, n_ticks, exact)
+                if metrics is not None:
+                    last = metrics.lap(_phase(jump), last)
+            self._current_tick += n_ticks
+            if self._validate_every is not None:
+                self._validate_due()
+            self._record()
+        finally:
+            if metrics is not None:
+                metrics.add_ticks(self._current_tick - first_tick,
+                                  self._n_updated(),
+                                  time.perf_counter() - start)
+
+    def _is_jumpable(self, exact: bool) -> bool:
+        for (_, jump, _), entities in self._groups:
+            if jump is None:
+                return False
+            # lazy vessels never jump here, see _materialize
+            if jump is SimulationKernel._jump_vessels and not exact \
+                    and self._last_ticks is None \
+                    and not self._can_jump(entities):
+                return False
+        return True
+
+    def run_until(self, time: float, exact: bool=False) -> None:
+        """Runs the simulation up to the first tick at or after `time`
+        (in the units of `Environment.time_tick`)."""
+        target_tick = time_to_tick(time, self._environment.time_tick)
+        if target_tick < self._current_tick:
+            raise cex.InvalidArgumentError(
+                f"Time {time} is before the current simulation time."
+            )
+        self.run(target_tick - self._current_tick, exact)
+
+    def _jump_vessels(self, vessels: list[Container | Cup], n_ticks: int,
+                      exact: bool) -> None:
+        if self._last_ticks is not None:
+            # exact or not, lazy vessels follow the stepped recurrence
+            return
+        # stepped instead if they cannot jump, see _is_jumpable
+        env = self._environment
+        step_factor = self._integrator.step_factor
+        if self._arrays is not None:
+            self._arrays.jump(env, n_ticks, exact, step_factor)
+            return
+        for vessel in vessels:
+            self._jump_vessel(vessel, n_ticks, exact)
+
+    def _can_jump(self, vessels: list[Container | Cup]) -> bool:
         env = self._environment
-        # calculate the differentials
-        # there are overridable constants if we specify but we assume that the
-        # constants to be used are from the environment
-        # for example, cooling rate may differ per entity
-        dT = env.cooling_rate * (cup.temp_curr - env.ambient_temp)
-        dV = env.evap_rate * (cup.temp_curr - env.ambient_temp)
-        dp = cup.tea_content.particle_release_rate \
-            * cup.tea_content.current_particle_amount
-        # apply time tick
-        dT *= env.time_tick
-        dV *= env.time_tick
-        dp *= env.time_tick
-        
-        # update the variables
-        cup.update_values({
-            "temp_curr": -dT,
-            "vol_curr": -dV,
-            "tea_content": {
-                "current_particle_amount": -dp
-            },
-            "tea_particle_amount": dp
-        })
-        
-        # clamp the contents of the container
-        # cup.correct_values()
-
-    def cmd(action: str, args: dict) -> None:
-        raise NotImplementedError
-
-    def obj_catalog(self) -> list[str]:
-        return self.entity_dict.keys()
+        step_factor = self._integrator.step_factor
+        if not analytic.is_monotonic(step_factor(env.cooling_rate * env.time_tick)):
+            return False
+        # without cooling a heater raises the temperature linearly, which
+        # only the exact solution jumps over
+        is_heated = self._arrays.is_heated() if self._arrays is not None \
+            else any(_heating(vessel) for vessel in vessels)
+        if is_heated and analytic.is_uncooled(env.cooling_rate):
+            return False
+        if self._arrays is not None:
+            return self._arrays.is_monotonic(env, step_factor)
+        return all(
+            analytic.is_monotonic(step_factor(
+                vessel.tea_content.particle_release_rate * env.time_tick))
+            for vessel in vessels)
+
+    def _jump_vessel(self, vessel: Container | Cup, n_ticks: int,
+                     exact: bool) -> None:
+        env = self._environment
+        tea = vessel.tea_content
+        step_factor = self._integrator.step_factor
+        temp_factor = analytic.decay_factor(env.cooling_rate, env.time_tick,
+                                            n_ticks, exact, step_factor)
+        particle_factor = analytic.decay_factor(tea.particle_release_rate,
+                                                env.time_tick, n_ticks, exact,
+                                                step_factor)
+        heating = _heating(vessel) or 0.0
+        duration = env.time_tick * n_ticks
+        new_temp = analytic.jump_temperature(vessel.temp_curr, env.ambient_temp,
+                                             temp_factor, heating,
+                                             env.cooling_rate, duration)
+        new_vol = analytic.jump_volume(
+            vessel.vol_curr, vessel.temp_curr, new_temp, env.cooling_rate,
+            env.evap_rate, duration, env.ambient_temp, heating)
+        dp = tea.current_particle_amount * (1 - particle_factor)
+        vessel.apply_deltas(new_temp - vessel.temp_curr,
+                            new_vol - vessel.vol_curr, dp)
+
+    def snapshot(self) -> bytes:
+        """Serializes the whole simulation state (entities, environment,
+        current tick, readiness, backend columns) into a binary blob that
+        `SimulationKernel.restore` turns back into a kernel. Attached
+        recorders and metrics are not part of the snapshot."""
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def restore(blob: bytes) -> "SimulationKernel":
+        kernel = pickle.loads(blob)
+        if not isinstance(kernel, SimulationKernel):
+            raise cex.InvalidArgumentError(
+                "Blob is not a snapshot of a simulation kernel."
+            )
+        return kernel
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # recorders own open files and threads
+        state["_recorders"] = []
+        # metrics are those of this process
+        state["_metrics"] = None
+        return state
+
+    def fork(self) -> "SimulationKernel":
+        """Returns an independent copy of the simulation for what-if
+        branching. The entities are cloned field by field, the array
+        backend columns are shared copy-on-write and the environment is
+        shared as is (the kernel never changes it). Recorders and metrics
+        are not carried over."""
+        fork = object.__new__(type(self))
+        fork.__dict__.update(self.__dict__)
+        clones = {id: entity._clone() for id, entity in self._registry.items()}
+        fork._registry = self._registry.remap(clones)
+        fork._tea_owners = {id(clone.tea_content): clone.id
+                            for clone in clones.values()
+                            if getattr(clone, "tea_content", None) is not None}
+        fork._groups = [
+            (functions, [clones[entity.id] for entity in entities])
+            for functions, entities in self._groups
+        ]
+        if self._arrays is not None:
+            fork._arrays = self._arrays.fork(
+                [clones[entity.id] for entity in self._arrays.entities])
+        fork._integrator = self._integrator.clone()
+        fork._recorders = []
+        fork._commands = list(self._commands)
+        fork._actions = self._actions.clone()
+        if self._last_ticks is not None:
+            fork._last_ticks = dict(self._last_ticks)
+        fork._exporter = None
+        fork._metrics = None
+        return fork
+
+    def cmd(self, action: str, args: dict | None=None, agent: str="",
+            is_strict: bool=False) -> None:
+        """Queues a command (see interpreter.COMMAND_SYNTAX), e.g.
+        `cmd("pour", {"from": "Container0", "to": "Cup0", "volume": 100})`.
+        Commands take effect from the next tick once they are committed."""
+        if not self._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "Method cannot be invoked due to simulation not fully set up \
+                properly."
+            )
+        self._commands.append(Command(agent, action, args or {}, is_strict))
+
+    def commit(self) -> int:
+        """Verifies the queued commands and compiles the valid ones into the
+        action buffer. Invalid commands are dropped with an
+        `InvalidCommandWarning`, unless they are strict, in which case
+        `InvalidCommandError` is raised and nothing is committed. Either way
+        the queue is emptied. Returns the number of commands committed."""
+        if not self._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "Method cannot be invoked due to simulation not fully set up \
+                properly."
+            )
+        commands = self._commands
+        self._commands = []
+        return Interpreter(self).commit(commands)
+
+    def _read_vessel(self, id: str) -> tuple[float, float, float]:
+        # (temperature, volume, dissolved particles) without syncing
+        if self._last_ticks is not None:
+            self._materialize([id])
+        if self._arrays is not None and id in self._arrays.rows:
+            row = self._arrays.rows[id]
+            return float(self._arrays.temp_curr[row]), \
+                float(self._arrays.vol_curr[row]), \
+                float(self._arrays.tea_particle_amount[row])
+        vessel = self._registry[id]
+        return vessel.temp_curr, vessel.vol_curr, vessel.tea_particle_amount
+
+    def _read_tea_volume(self, id: str) -> float:
+        if self._arrays is not None and id in self._arrays.rows:
+            return float(self._arrays.tea_volume[self._arrays.rows[id]])
+        return self._registry[id].tea_content.volume
+
+    def _apply_actions(self, deltas: dict[str, DeltaObject]) -> None:
+        # one pass over the vessels touched this tick
+        if self._last_ticks is not None:
+            self._materialize(deltas)
+        if self._arrays is not None:
+            # vessels of a class with its own update functions are not in
+            # the columns and take their actions as objects
+            rows = self._arrays.rows
+            in_arrays = {id: delta for id, delta in deltas.items()
+                         if id in rows}
+            if in_arrays:
+                self._arrays.apply_actions(in_arrays)
+            for id, delta in deltas.items():
+                if id not in rows:
+                    delta.apply(self._registry[id])
+                elif delta.heater is not None:
+                    self._registry[id].is_heater_on = delta.heater
+            return
+        for id, delta in deltas.items():
+            delta.apply(self._registry[id])
+
+    def obj_catalog(self, types: type | tuple[type, ...] | None=None,
+                    tags: str | Iterable[str] | None=None) -> list[str]:
+        return [entity.id for entity in self._registry.select(
+            types=types, tags=tags)]
 
     def view_obj(self, id: str, show_static: bool=False) -> dict:
-        if id not in self._id_list:
+        if id not in self._registry:
             raise cex.NonExistentObjectError(
                 "Object with such id does not exist."
             )
-        entity = self._entity_dict[id]
-        return entity.view_status(show_static)
+        self._sync([id])
+        entity = self._registry[id]
+        return entity.to_json(show_static)
 
-    def view_status(self, verbose: bool=False) -> dict:
+    def view_status(self, verbose: bool=False,
+                    ids: Iterable[str] | None=None,
+                    types: type | tuple[type, ...] | None=None,
+                    tags: str | Iterable[str] | None=None) -> dict:
+        """Serializes every entity, or only those matching all of the given
+        filters (see `EntityRegistry.select`)."""
+        if ids is None and types is None and tags is None:
+            entities = self._registry.values()
+            self._sync()
+        else:
+            entities = self._registry.select(ids, types, tags)
+            self._sync([entity.id for entity in entities])
         status_dict = {}
-        for id, entity in self._entity_dict.items():
-            status_dict[id] = entity.to_json(verbose)
+        for entity in entities:
+            status_dict[entity.id] = entity.to_json(verbose)
         if verbose:
             status_dict["env"] = self._environment
         return status_dict
 
-    
+    def export(self, fields: Iterable[str] | None=None, since: int | None=None,
+               encoding: str="columns") -> dict | bytes:
+        """Bulk counterpart of `view_status` for frequent polling: the vessels
+        as one column per field (see `export.StateExporter`), projected on
+        `fields` (by default the variables of `to_json`). With `since` (the
+        "tick" of an earlier export with the same fields), only the vessels
+        that changed since are included. `encoding="json"` returns the
+        columns as encoded JSON bytes."""
+        return self._state_exporter().export(fields, since, encoding)
+
+    def changes(self, since: int | None=None,
+                fields: Iterable[str] | None=None, epsilon: float=0.0) -> dict:
+        """Only the vessel fields that moved by more than `epsilon` since the
+        watermark `since`, the "tick" of an earlier call (see
+        `export.StateExporter.changes`). Vessels that have settled drop out,
+        so for mostly idle scenes this is far less to serialize and ship
+        than `view_status`."""
+        return self._state_exporter().changes(fields, since, epsilon)
+
+    def _state_exporter(self) -> StateExporter:
+        if not self._is_ready_to_run:
+            raise cex.SimulationNotReadyError(
+                "Method cannot be invoked due to simulation not fully set up \
+                properly."
+            )
+        if self._exporter is None:
+            self._exporter = StateExporter(self)
+        if self._last_ticks is not None:
+            # the exporter reads the vessels directly
+            self._materialize()
+        return self._exporter
+
+    def _sync(self, ids: list[str] | None=None) -> None:
+        # bring the entity objects (all, or the given ones) up to date before
+        # serializing them
+        if self._arrays is not None:
+            self._arrays.sync(ids=ids)
+        if self._last_ticks is not None:
+            self._materialize(ids)
+
+    def _materialize(self, ids: Iterable[str] | None=None,
+                     check: bool | None=None) -> None:
+        # bring the lazy vessels (all, or the given ones) forward to the
+        # current tick, in closed form unless only stepping gives the result
+        # advance() would have, and check their bounds (by default if the
+        # kernel validates at all). Vessels that fail are put back where they
+        # were, so that they fail again the next time they are observed
+        if check is None:
+            check = self._validate_every is not None
+        tick = self._current_tick
+        stale = []
+        states = []
+        for id in self._last_ticks if ids is None else ids:
+            last = self._last_ticks.get(id)
+            if last is None or last == tick:
+                continue
+            vessel = self._registry[id]
+            states.append((vessel.temp_curr, vessel.vol_curr,
+                           vessel.tea_particle_amount,
+                           vessel.tea_content.current_particle_amount))
+            if _heating(vessel) and analytic.is_uncooled(
+                    self._environment.cooling_rate):
+                # a heater without cooling is linear only in the exact
+                # solution
+                for _ in range(tick - last):
+                    self._step_vessels([vessel])
+            else:
+                self._jump_vessel(vessel, tick - last, False)
+            stale.append(vessel)
+        if stale and check:
+            try:
+                self._validate_entities(stale)
+            except cex.ValueOutOfRangeError:
+                for vessel, state in zip(stale, states):
+                    vessel.temp_curr, vessel.vol_curr, \
+                        vessel.tea_particle_amount, \
+                        vessel.tea_content.current_particle_amount = state
+                raise
+        for vessel in stale:
+            self._last_ticks[vessel.id] = tick
+
+def _heating(vessel: Container | Cup) -> float | None:
+    # heating term of analytic.vessel_derivative, cups have no heater
+    if getattr(vessel, "is_heater_on", False):
+        return vessel.heating_rate
+    return None
+
+def _phase(function: Callable) -> str:
+    # metrics phase of an update function, e.g. "advance_vessels"
+    return function.__name__.lstrip("_")
 
+SimulationKernel.register_advance(Container, SimulationKernel._advance_vessels,
+                                  SimulationKernel._jump_vessels,
+                                  SimulationKernel._validate_vessels)
+SimulationKernel.register_advance(Cup, SimulationKernel._advance_vessels,
+                                  SimulationKernel._jump_vessels,
+                                  SimulationKernel._validate_vessels)
@@ -1,43 +1,46 @@
 from entity import Entity
 import custom_exceptions as cex
+from schema import Schema, Fields, compile_validator, \
+    compile_batch_validator
 from utils import number
+from vessel_type import TeaType
 
 class TeaState(Entity):
+    # the static parameters are shared through a TeaType, see vessel_type
+    __slots__ = ("tea_type", "volume", "current_particle_amount")
+
+    # for checking constants
+    INIT_SCHEMA: Fields = (
+        ("tea_type", Schema(TeaType)),
+        ("volume", Schema(number, min_val=0, label="Volume")),
+    )
+    # for updating variables
+    SCHEMA: Fields = (
+        ("current_particle_amount",
+         Schema(number, min_val=0, label="Current particle amount")),
+    )
+    _init_validate = compile_validator(INIT_SCHEMA, "INIT_SCHEMA",
+                                       "_init_validate")
+    _validate = compile_validator(SCHEMA)
+    _validate_many = staticmethod(compile_batch_validator(SCHEMA))
+
     def __init__(self, id: str, start_particle_count: float=0.0, volume: float=0.0,
                  particle_release_rate: float=1.0) -> None:
         super().__init__(id)
-        self.start_particle_count = start_particle_count
+        self.tea_type = TeaType(start_particle_count, particle_release_rate)
         self.volume = volume
-        self.particle_release_rate = particle_release_rate
         # variables
         self.current_particle_amount = start_particle_count
         self._init_validate()
 
-    # for checking constants
-    def _init_validate(self) -> None:
-        if self.start_particle_count < 0:
-            raise cex.LowerBoundError(
-                f"Initial particle count ({self.start_particle_count}) \
-                    cannot be negative."
-            )
-        if self.volume < 0:
-            raise cex.LowerBoundError(
-                f"Volume ({self.volume}) cannot be negative."
-            )
-        if self.particle_release_rate < 0:
-            raise cex.LowerBoundError(
-                f"Particle release rate ({self.particle_release_rate}) \
-                    cannot be negative."
-            )
-    
-    # for updating variables
-    def _validate(self) -> None:
-        if self.current_particle_amount < 0:
-            raise cex.LowerBoundError(
-                f"Current particle amount ({self.particle_release_rate}) \
-                    cannot be negative."
-            )
-    
+    @property
+    def start_particle_count(self) -> float:
+        return self.tea_type.start_particle_count
+
+    @property
+    def particle_release_rate(self) -> float:
+        return self.tea_type.particle_release_rate
+
     def _update_value(self, dict_key:str, value:any) -> None:
         # only update updatable variables
         match dict_key:
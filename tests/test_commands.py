@@ -0,0 +1,138 @@
+"""Commands through SimulationKernel.cmd/commit and the action buffer.
+
+Run from the repository root with `python -m pytest tests`.
+"""
+import random
+import warnings
+import pytest
+from container import Container
+from cup import Cup
+from teastate import TeaState
+from environment import Environment
+from simulation_kernel import SimulationKernel
+import custom_exceptions as cex
+import custom_warnings as cwa
+
+COMMANDS: list[tuple[str, dict]] = [
+    ("pour", {"from": "pot", "to": "cup0", "volume": 60, "ticks": 3}),
+    ("pour", {"from": "pot", "to": "cup1", "volume": 40, "ticks": 2}),
+    ("pour", {"from": "spigot", "to": "cup0", "volume": 10, "temp": 20}),
+    ("add_leaves", {"to": "cup1", "particles": 5, "volume": 1}),
+    ("toggle_heater", {"container": "pot", "is_on": True}),
+    ("discard", {"from": "pot", "volume": 25}),
+]
+
+def make_sim(backend: str="object") -> SimulationKernel:
+    sim = SimulationKernel(backend=backend)
+    sim.add_objs([
+        Container("pot", temp_init=95, vol_init=1000,
+                  tea_content=TeaState("pot_tea", start_particle_count=50,
+                                       particle_release_rate=0.01)),
+        Cup("cup0", temp_init=30, vol_init=20),
+        Cup("cup1", temp_init=30, vol_init=20),
+    ])
+    sim.config_env(Environment(cooling_rate=0.004, evap_rate=0.001,
+                               time_tick=0.1))
+    sim.confirm_setup()
+    return sim
+
+def state(sim: SimulationKernel) -> dict:
+    return {id: sim.view_obj(id, True) for id in sim.obj_catalog()}
+
+@pytest.mark.parametrize("backend", ["object", "array"])
+def test_commit_order_does_not_matter(backend):
+    # the pours of a tick are merged, whatever order they were queued in
+    results = []
+    for seed in range(3):
+        commands = list(COMMANDS)
+        random.Random(seed).shuffle(commands)
+        sim = make_sim(backend)
+        for action, args in commands:
+            sim.cmd(action, args)
+        assert sim.commit() == len(commands)
+        sim.run(10)
+        results.append(state(sim))
+    assert results[0] == results[1] == results[2]
+
+def test_commands_take_effect_on_the_next_tick():
+    sim = make_sim()
+    sim.cmd("pour", {"from": "pot", "to": "cup0", "volume": 60, "ticks": 3})
+    sim.commit()
+    assert sim.view_obj("cup0", True)["vol_curr"] == 20
+    volumes = []
+    for _ in range(4):
+        sim.advance()
+        volumes.append(sim.view_obj("cup0", True)["vol_curr"])
+    # 20 per tick for three ticks, then only evaporation
+    assert volumes[0] == pytest.approx(40, abs=0.1)
+    assert volumes[2] == pytest.approx(80, abs=0.1)
+    assert volumes[3] < volumes[2]
+
+def test_run_agrees_with_stepping_through_actions():
+    stepped, jumped = make_sim(), make_sim()
+    for sim in (stepped, jumped):
+        for action, args in COMMANDS:
+            sim.cmd(action, args)
+        sim.commit()
+    for _ in range(50):
+        stepped.advance()
+    jumped.run(50)
+    jumped_state = state(jumped)
+    for id, values in state(stepped).items():
+        for field, value in values.items():
+            assert jumped_state[id][field] == pytest.approx(value, rel=1e-9)
+
+@pytest.mark.parametrize("args, agent", [
+    ({"from": "pot", "to": "cup0", "volume": float("nan")}, ""),
+    ({"from": "pot", "to": "cup0", "volume": float("inf")}, ""),
+    ({"from": "pot", "to": "cup0", "volume": 10}, ["agent"]),
+    ({"from": "pot", "to": "nowhere", "volume": 10}, ""),
+])
+def test_invalid_commands_are_rejected(args, agent):
+    sim = make_sim()
+    sim.cmd("pour", args, agent=agent)
+    with pytest.warns(cwa.InvalidCommandWarning):
+        assert sim.commit() == 0
+    sim.cmd("pour", args, agent=agent, is_strict=True)
+    with pytest.raises(cex.InvalidCommandError):
+        sim.commit()
+    # the failed batch does not stay queued
+    sim.cmd("pour", {"from": "pot", "to": "cup0", "volume": 10})
+    assert sim.commit() == 1
+
+def test_non_string_action_is_rejected():
+    sim = make_sim()
+    sim.cmd(["pour"], {})
+    with pytest.warns(cwa.InvalidCommandWarning):
+        assert sim.commit() == 0
+
+def test_fork_does_not_share_pending_actions():
+    sim = make_sim()
+    sim.cmd("pour", {"from": "pot", "to": "cup0", "volume": 60, "ticks": 3})
+    sim.commit()
+    fork = sim.fork()
+    fork.cmd("pour", {"from": "pot", "to": "cup1", "volume": 30})
+    fork.commit()
+    sim.run(5)
+    fork.run(5)
+    assert sim.view_obj("cup1", True)["vol_curr"] < 20
+    assert fork.view_obj("cup1", True)["vol_curr"] > 40
+    assert sim.view_obj("cup0", True)["vol_curr"] \
+        == fork.view_obj("cup0", True)["vol_curr"]
+
+def test_actions_reach_vessels_outside_the_columns():
+    class Mug(Cup):
+        pass
+    SimulationKernel.register_advance(Mug, lambda kernel, mugs: None)
+    sim = SimulationKernel(backend="array")
+    sim.add_objs([Container("pot", temp_init=95, vol_init=1000),
+                  Mug("mug", temp_init=30, vol_init=20)])
+    sim.config_env(Environment(cooling_rate=0.004, evap_rate=0.001,
+                               time_tick=0.1))
+    sim.confirm_setup()
+    sim.cmd("pour", {"from": "pot", "to": "mug", "volume": 50})
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        sim.commit()
+    sim.advance()
+    assert sim.view_obj("mug", True)["vol_curr"] == pytest.approx(70)
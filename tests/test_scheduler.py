@@ -0,0 +1,83 @@
+"""Event ticks of the Scheduler against stepping the kernel tick by tick.
+
+Run from the repository root with `python -m pytest tests`.
+"""
+import pytest
+from container import Container
+from cup import Cup
+from teastate import TeaState
+from environment import Environment
+from simulation_kernel import SimulationKernel
+from scheduler import Scheduler
+
+POUR: dict = {"from": "pot", "to": "cup", "volume": 200, "ticks": 20}
+HEATER: dict = {"container": "pot", "is_on": True}
+
+def make_sim(backend: str="object", integrator: str="euler") \
+        -> SimulationKernel:
+    sim = SimulationKernel(backend=backend, integrator=integrator)
+    sim.add_objs([
+        Container("pot", temp_init=100, vol_init=1000, heating_rate=0.07,
+                  tea_content=TeaState("pot_tea", start_particle_count=100,
+                                       particle_release_rate=0.002)),
+        Cup("cup", temp_init=20, vol_init=0, tea_content=TeaState("cup_tea")),
+    ])
+    sim.config_env(Environment(cooling_rate=0.001, evap_rate=0.0001,
+                               time_tick=0.1))
+    sim.confirm_setup()
+    return sim
+
+def stepped_crossings(sim: SimulationKernel, max_ticks: int) -> dict[str, int]:
+    # the reference: look at the vessels every tick, as a polling loop would
+    ticks = {}
+    while sim._current_tick < max_ticks and len(ticks) < 2:
+        status = sim.view_status()
+        if "heater" not in ticks and status["pot"]["temp_curr"] < 80:
+            ticks["heater"] = sim._current_tick
+            sim.cmd("toggle_heater", HEATER)
+            sim.commit()
+        if "strong" not in ticks \
+                and status["pot"]["tea_particle_amount"] > 60:
+            ticks["strong"] = sim._current_tick
+        sim.advance()
+    return ticks
+
+@pytest.mark.parametrize("backend", ["object", "array"])
+@pytest.mark.parametrize("integrator", ["euler", "rk4"])
+def test_triggers_fire_at_the_crossing(backend, integrator):
+    scheduler = Scheduler(make_sim(backend, integrator))
+    scheduler.when("pot", "temp_curr", "<", 80, "toggle_heater", HEATER,
+                   name="heater")
+    scheduler.when("pot", "tea_particle_amount", ">", 60,
+                   lambda kernel, event: None, name="strong")
+    events = {event.name: event.tick for event in scheduler.run_until(1000)}
+    expected = stepped_crossings(make_sim(backend, integrator), 10_000)
+    assert expected.keys() == {"heater", "strong"}
+    # never before the crossing, at most the default tolerance of a tick after
+    for name, tick in expected.items():
+        assert tick <= events[name] <= tick + 1
+
+@pytest.mark.parametrize("backend", ["object", "array"])
+def test_timed_commands_match_stepping(backend):
+    scheduler = Scheduler(make_sim(backend))
+    scheduler.at(30, "pour", POUR)
+    events = scheduler.run_until(40)
+    assert [event.tick for event in events] == [300]
+
+    stepped = make_sim(backend)
+    for tick in range(400):
+        if tick == 300:
+            stepped.cmd("pour", POUR)
+            stepped.commit()
+        stepped.advance()
+    assert scheduler.kernel._current_tick == stepped._current_tick == 400
+    scheduled = scheduler.kernel.view_status()
+    for id, values in stepped.view_status().items():
+        for field, value in values.items():
+            assert scheduled[id][field] == pytest.approx(value, rel=1e-9)
+
+def test_unmet_triggers_do_not_fire():
+    scheduler = Scheduler(make_sim())
+    scheduler.when("cup", "temp_curr", ">", 200, lambda kernel, event: None)
+    assert scheduler.run_until(50) == []
+    assert scheduler.kernel._current_tick == 500
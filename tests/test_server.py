@@ -0,0 +1,90 @@
+"""Rejection of malformed commands and requests by the SimulationServer.
+
+Run from the repository root with `python -m pytest tests`.
+"""
+import asyncio
+import json
+import pytest
+from container import Container
+from cup import Cup
+from environment import Environment
+from simulation_kernel import SimulationKernel
+from server import SimulationServer, SimulationClient
+import custom_exceptions as cex
+
+POUR: dict = {"from": "pot", "to": "cup", "volume": 5}
+# a stuck server fails the test rather than hanging the run
+TIMEOUT: float = 10
+
+def make_sim() -> SimulationKernel:
+    sim = SimulationKernel()
+    sim.add_objs([Container("pot", temp_init=95, vol_init=1000),
+                  Cup("cup", temp_init=90, vol_init=100)])
+    sim.config_env(Environment(cooling_rate=0.004, evap_rate=0.001,
+                               time_tick=0.1))
+    sim.confirm_setup()
+    return sim
+
+async def serve(test) -> None:
+    # runs `test(server, port)` against a running server, then shuts it down
+    server = SimulationServer(make_sim(), ratio=None)
+    server.start()
+    listener = await server.serve()
+    try:
+        await test(server, listener.sockets[0].getsockname()[1])
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        await server.stop()
+
+def run(test) -> None:
+    asyncio.run(asyncio.wait_for(serve(test), TIMEOUT))
+
+@pytest.mark.parametrize("action, args, agent", [
+    (["pour"], POUR, ""),
+    ("pour", POUR, ["agent"]),
+    ("pour", [1], ""),
+    ("pour", {"from": "pot", "to": "nowhere", "volume": 5}, ""),
+])
+def test_invalid_commands_fail_alone(action, args, agent):
+    async def test(server, port):
+        client = await SimulationClient.connect(port=port)
+        try:
+            with pytest.raises(cex.InvalidCommandError):
+                await asyncio.wait_for(client.cmd(action, args, agent), 5)
+            # neither the loop nor the connection went down with it
+            assert server.is_running
+            assert await asyncio.wait_for(client.cmd("pour", POUR), 5) >= 0
+        finally:
+            await client.close()
+    run(test)
+
+def test_submit_rejects_non_strings():
+    async def test(server, port):
+        with pytest.raises(cex.InvalidCommandError):
+            await server.submit(["pour"], POUR)
+        with pytest.raises(cex.InvalidCommandError):
+            await server.submit("pour", POUR, agent=None)
+        assert await server.submit("pour", POUR) >= 0
+    run(test)
+
+@pytest.mark.parametrize("maxsize", [0, -1, "x", True])
+def test_bad_subscriptions_get_an_error(maxsize):
+    async def test(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            writer.write(json.dumps({"op": "subscribe",
+                                     "maxsize": maxsize}).encode() + b"\n")
+            writer.write(json.dumps({"op": "cmd", "id": 1, "action": "pour",
+                                     "args": POUR}).encode() + b"\n")
+            await writer.drain()
+            replies = [json.loads(await asyncio.wait_for(reader.readline(),
+                                                         5))
+                       for _ in range(2)]
+            # the connection survives the bad request
+            assert "error" in replies[0] and "id" not in replies[0]
+            assert replies[1]["id"] == 1 and "tick" in replies[1]
+        finally:
+            writer.close()
+            await writer.wait_closed()
+    run(test)
@@ -0,0 +1,154 @@
+import json
+import math
+import os
+import custom_exceptions as cex
+from utils import time_to_tick
+from array_backend import np
+
+# Trajectory directory layout:
+#   header.json      ids, fields, dtype and time_tick of the recording
+#   ticks.bin        int64 tick of every row
+#   <field>.bin      one [row x entity] array per field, row-major
+# Every file is appended to as rows arrive and memory-mapped on read, so
+# histories larger than memory can be queried.
+
+HEADER_FILE: str = "header.json"
+TICKS_FILE: str = "ticks.bin"
+
+class TrajectoryWriter:
+    """Recorder sink that appends every flushed block to a trajectory
+    directory, to be read back with `TrajectoryReader`:
+
+        sim.attach_recorder(Recorder(TrajectoryWriter("brew.traj")))
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._files: dict = {}
+
+    def open(self, ids: list[str], fields: tuple[str, ...],
+             time_tick: float, dtype: str="float64") -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        header = {"ids": ids, "fields": list(fields), "dtype": dtype,
+                  "time_tick": time_tick}
+        with open(os.path.join(self.directory, HEADER_FILE), "w") as file:
+            json.dump(header, file)
+        # start a fresh recording
+        self._files = {
+            name: open(os.path.join(self.directory, name), "wb")
+            for name in [TICKS_FILE] + [f"{field}.bin" for field in fields]
+        }
+
+    def write(self, ticks: "np.ndarray", columns: dict) -> None:
+        self._files[TICKS_FILE].write(
+            np.ascontiguousarray(ticks, dtype=np.int64).tobytes())
+        for field, block in columns.items():
+            self._files[f"{field}.bin"].write(
+                np.ascontiguousarray(block).tobytes())
+        # the field files are flushed before the ticks so that a reader never
+        # sees a tick without its values
+        for name, file in self._files.items():
+            if name != TICKS_FILE:
+                file.flush()
+        self._files[TICKS_FILE].flush()
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+
+class TrajectoryReader:
+    """Random access into a trajectory directory without loading it.
+
+    All arrays are `numpy.memmap`s. Time ranges and contiguous runs of
+    entities are returned as views, an arbitrary subset of entities only
+    copies the selected rows of the selected range."""
+
+    def __init__(self, directory: str) -> None:
+        if np is None:
+            raise cex.BackendNotAvailableError(
+                "Reading trajectories requires numpy to be installed."
+            )
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE)) as file:
+            header = json.load(file)
+        self.ids: list[str] = header["ids"]
+        self.fields: list[str] = header["fields"]
+        self.time_tick: float = header["time_tick"]
+        self.dtype = np.dtype(header["dtype"])
+        self._entity_index: dict[str, int] = {
+            id: index for index, id in enumerate(self.ids)
+        }
+        self.ticks = self._map(TICKS_FILE, np.dtype(np.int64), ())
+        self._columns: dict[str, "np.ndarray"] = {
+            field: self._map(f"{field}.bin", self.dtype, (len(self.ids),))
+            for field in self.fields
+        }
+
+    def _map(self, name: str, dtype: "np.dtype", row_shape: tuple) -> "np.ndarray":
+        path = os.path.join(self.directory, name)
+        row_bytes = dtype.itemsize * math.prod(row_shape)
+        n_rows = os.path.getsize(path) // row_bytes if row_bytes else 0
+        if n_rows == 0:
+            return np.empty((0,) + row_shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(n_rows,) + row_shape)
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def field(self, field: str) -> "np.ndarray":
+        """The whole [row x entity] memory map of `field`."""
+        if field not in self._columns:
+            raise cex.InvalidArgumentError(f"Field {field} was not recorded.")
+        # rows are only complete up to the last written tick
+        return self._columns[field][:len(self.ticks)]
+
+    def row_at_tick(self, tick: int) -> int:
+        """Row holding the state at `tick`. Ticks that were not recorded,
+        e.g. within a `run()` jump or between the rows of a recorder with
+        `every`, raise `NonExistentObjectError` rather than returning the
+        state of another tick."""
+        row = int(np.searchsorted(self.ticks, tick))
+        if row == len(self.ticks) or self.ticks[row] != tick:
+            raise cex.NonExistentObjectError(
+                f"Tick {tick} was not recorded."
+            )
+        return row
+
+    def tick_at_time(self, time: float) -> int:
+        return time_to_tick(time, self.time_tick, False)
+
+    def at(self, time: float, entity_id: str, field: str) -> float:
+        """Value of `field` of `entity_id` at simulation time `time`, e.g.
+        `reader.at(512.3, "cup_17", "temp_curr")`, i.e. at the last tick at
+        or before it, which must have been recorded (see `row_at_tick`)."""
+        row = self.row_at_tick(self.tick_at_time(time))
+        return float(self.field(field)[row, self._column(entity_id)])
+
+    def slice(self, field: str, start_time: float | None=None,
+              end_time: float | None=None,
+              entity_ids: list[str] | None=None) -> tuple["np.ndarray", "np.ndarray"]:
+        """Returns the ticks and the [row x entity] values of `field` for the
+        rows with `start_time <= time <= end_time` (both optional) and the
+        given entities (all if None, in the order given otherwise)."""
+        start = 0 if start_time is None else int(np.searchsorted(
+            self.ticks, time_to_tick(start_time, self.time_tick)))
+        end = len(self.ticks) if end_time is None else int(np.searchsorted(
+            self.ticks, self.tick_at_time(end_time), side="right"))
+        values = self.field(field)[start:end]
+        if entity_ids is not None:
+            columns = [self._column(id) for id in entity_ids]
+            if columns and columns == list(range(columns[0],
+                                                 columns[0] + len(columns))):
+                # a contiguous run of entities stays a view
+                values = values[:, columns[0]:columns[0] + len(columns)]
+            else:
+                values = values[:, columns]
+        return self.ticks[start:end], values
+
+    def _column(self, entity_id: str) -> int:
+        if entity_id not in self._entity_index:
+            raise cex.NonExistentObjectError(
+                f"Entity {entity_id} was not recorded."
+            )
+        return self._entity_index[entity_id]
@@ -1,7 +1,17 @@
+import math
+
 MIN_TEMP: float = -273.15
 
 number = int | float
 
 def clamp(self, n: number, lower: number=float("inf"),
            upper: number=float("inf")) -> number:
-    return max(lower, min(n, upper))
\ No newline at end of file
+    return max(lower, min(n, upper))
+
+def time_to_tick(time: float, time_tick: float, round_up: bool=True) -> int:
+    """The first tick at or after `time` (in the units of `time_tick`), or
+    with `round_up` False the last one at or before it."""
+    # allow for rounding in time / time_tick, e.g. 0.3 / 0.1
+    if round_up:
+        return math.ceil(time / time_tick - 1e-9)
+    return math.floor(time / time_tick + 1e-9)
@@ -0,0 +1,91 @@
+import weakref
+from schema import Schema, Fields
+from utils import MIN_TEMP, number
+
+class StaticRecord:
+    """Immutable static parameters shared by every entity built with the same
+    values (flyweight), given positionally in the order of `_fields`, e.g.
+    `VesselType(temp_init, vol_init, vol_max)`. Constructing a record with
+    the values of a live one (of the same types) returns that one, so a
+    fleet of identical cups holds a single record instead of a copy of
+    every parameter per cup."""
+    __slots__ = ("__weakref__",)
+    _fields: tuple[str, ...] = ()
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        # the live records of each class, dropping a record with its last user
+        cls._records = weakref.WeakValueDictionary()
+
+    def __new__(cls, *values: any) -> "StaticRecord":
+        # equal values of the same types share a record, 100 and 100.0 do
+        # not, so that a record keeps the values it was built with
+        key = tuple((type(value), value) for value in values)
+        records = cls._records
+        record = records.get(key)
+        if record is None:
+            if len(values) != len(cls._fields):
+                raise TypeError(
+                    f"{cls.__name__} takes the values of {cls._fields}."
+                )
+            record = object.__new__(cls)
+            for field, value in zip(cls._fields, values):
+                object.__setattr__(record, field, value)
+            records[key] = record
+        return record
+
+    def __setattr__(self, name: str, value: any) -> None:
+        raise AttributeError(
+            f"{type(self).__name__} is shared and cannot be changed."
+        )
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(
+            f"{type(self).__name__} is shared and cannot be changed."
+        )
+
+    def __reduce__(self) -> tuple:
+        # unpickled records are interned again
+        return type(self), tuple(getattr(self, field) for field in self._fields)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{field}={getattr(self, field)!r}"
+                           for field in self._fields)
+        return f"{type(self).__name__}({values})"
+
+class VesselType(StaticRecord):
+    """Static parameters of a cup, and of a container through
+    `ContainerType`."""
+    __slots__ = ("temp_init", "vol_init", "vol_max")
+    _fields = __slots__
+
+    # the bounds of the parameters, checked as part of the init validation
+    # of the vessel holding the record
+    INIT_SCHEMA: Fields = (
+        ("temp_init", Schema(number, min_val=MIN_TEMP,
+                             label="Initial temperature",
+                             min_label="absolute zero")),
+        ("vol_init", Schema(number, min_val=0, label="Initial volume")),
+        ("vol_max", Schema(number, min_val=0, label="Maximum volume")),
+    )
+
+class ContainerType(VesselType):
+    """Static parameters of a container, which unlike a cup has a heater."""
+    __slots__ = ("heating_rate",)
+    _fields = VesselType._fields + __slots__
+
+    INIT_SCHEMA: Fields = VesselType.INIT_SCHEMA + (
+        ("heating_rate", Schema(number, min_val=0, label="Heating rate")),
+    )
+
+class TeaType(StaticRecord):
+    """Static parameters of a tea state."""
+    __slots__ = ("start_particle_count", "particle_release_rate")
+    _fields = __slots__
+
+    INIT_SCHEMA: Fields = (
+        ("start_particle_count",
+         Schema(number, min_val=0, label="Initial particle count")),
+        ("particle_release_rate",
+         Schema(number, min_val=0, label="Particle release rate")),
+    )